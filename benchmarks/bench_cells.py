@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Minkowski Dimension Calculator: QGIS Plugin
+
+https://github.com/eduard-kazakov/minkowskiDimCalculator
+
+Eduard Kazakov | ee.kazakov@gmail.com
+
+Memory and time of the cell occupancy structures. The reference engine used
+to keep a Python set of (ix, iy) tuples. It now uses a CellSet: a byte map
+over small grids and sorted Morton keys otherwise. For each curve and box
+size, this fills a tuple set and both kinds of CellSet from a per-vertex
+loop, as the reference engine does. It reports the traced peak memory per
+occupied cell, including the per-vertex buffers and merge temporaries, and
+the time per vertex.
+
+    python benchmarks/bench_cells.py --generators koch walk --vertices 1000000
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import minkowski_dim_calculator_core as core  # noqa: E402
+from bench_estimator import GENERATORS  # noqa: E402
+
+
+def fill_tuple_set(xs, ys, s):
+    seen = set()
+    for x, y in zip(xs, ys):
+        seen.add((math.floor(x / s), math.floor(y / s)))
+    return len(seen)
+
+
+def fill_cell_set(xs, ys, s, ranges):
+    seen = core.CellSet(*ranges)
+    for x, y in zip(xs, ys):
+        seen.add(math.floor(x / s), math.floor(y / s))
+    return len(seen), seen.nbytes
+
+
+def measure(func, *args):
+    """(result, traced peak bytes, seconds) of a call; timed in a second call without tracing."""
+    tracemalloc.start()
+    result = func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    func(*args)
+    return result, peak, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory per occupied cell: tuple set against CellSet.")
+    parser.add_argument("--generators", nargs="+", choices=sorted(GENERATORS), default=["koch", "walk"])
+    parser.add_argument("--vertices", type=int, default=1000000)
+    parser.add_argument("--cells", type=int, nargs="+", default=[1000, 100000, 10000000],
+                        help="approximate grid sizes in cells over the bounding box (default: 1e3 1e5 1e7)")
+    args = parser.parse_args(argv)
+
+    header = "%-8s %10s %10s | %-14s | %-21s | %-21s"
+    print(header % ("curve", "grid", "occupied", "tuple set", "CellSet keys", "CellSet bitmap"))
+    print(header % ("", "cells", "cells", "peak B  ns/vtx", "peak B  held B ns/vtx", "peak B  held B ns/vtx"))
+    for name in args.generators:
+        xy, _ = GENERATORS[name](args.vertices)
+        xy = xy - xy.min(axis=0)
+        xs = xy[:, 0].tolist()
+        ys = xy[:, 1].tolist()
+        w, h = (float(v) for v in xy.max(axis=0))
+        for grid in args.cells:
+            s = math.sqrt(max(w * h, 1e-12) / grid) if w > 0 and h > 0 else max(w, h) / grid
+            bounds = ((0, math.floor(w / s)), (0, math.floor(h / s)))
+
+            cols = []
+            n_cells = None
+            for func, extra in ((fill_tuple_set, ()), (fill_cell_set, ((None, None),)), (fill_cell_set, (bounds,))):
+                result, peak, elapsed = measure(func, xs, ys, s, *extra)
+                count, held = result if extra else (result, None)
+                if n_cells is None:
+                    n_cells = count
+                elif count != n_cells:
+                    raise SystemExit("cell counts differ: %d != %d" % (count, n_cells))
+                per_cell = 1.0 / max(1, count)
+                if held is None:
+                    cols.append("%6.1f %7.0f" % (peak * per_cell, 1e9 * elapsed / len(xs)))
+                else:
+                    cols.append("%6.1f %6.1f %7.0f" % (peak * per_cell, held * per_cell, 1e9 * elapsed / len(xs)))
+
+            n_grid = (bounds[0][1] + 1) * (bounds[1][1] + 1)
+            print(header % (name, n_grid, n_cells, cols[0], cols[1], cols[2]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
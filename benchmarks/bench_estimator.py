@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Minkowski Dimension Calculator: QGIS Plugin
+
+https://github.com/eduard-kazakov/minkowskiDimCalculator
+
+Eduard Kazakov | ee.kazakov@gmail.com
+
+Benchmark of the QGIS-free estimator on deterministic curves of known
+dimension: Koch curves, Lévy C curves, random walks and straight lines, from
+10^2 to 10^7 vertices. Reports features/s, vertices/s, peak memory and the
+error of the estimate against the known dimension.
+
+    python benchmarks/bench_estimator.py --save benchmarks/baseline.json
+    python benchmarks/bench_estimator.py --baseline benchmarks/baseline.json
+
+With --baseline, cases that got slower, use more memory or estimate worse
+than the recorded run are listed and the exit status is 1.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import struct
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import minkowski_dim_calculator_core as core  # noqa: E402
+
+
+def koch_curve(n_vertices):
+    """Koch curve on the unit segment; 4^level + 1 vertices, dimension log 4 / log 3."""
+    level = max(1, int(round(math.log(max(2, n_vertices - 1), 4))))
+    pts = np.array([[0.0, 0.0], [1.0, 0.0]])
+    rot = np.array([[0.5, -math.sqrt(3) / 2.0], [math.sqrt(3) / 2.0, 0.5]])
+    for _ in range(level):
+        a, b = pts[:-1], pts[1:]
+        d = (b - a) / 3.0
+        p1 = a + d
+        p3 = a + 2.0 * d
+        p2 = p1 + d @ rot.T
+        out = np.empty((4 * a.shape[0] + 1, 2))
+        out[0:-1:4] = a
+        out[1::4] = p1
+        out[2::4] = p2
+        out[3::4] = p3
+        out[-1] = pts[-1]
+        pts = out
+    return pts, math.log(4.0) / math.log(3.0)
+
+
+def levy_c_curve(n_vertices):
+    """Lévy C curve; 2^level + 1 vertices, dimension 2 (of the limit set)."""
+    level = max(1, int(round(math.log2(max(2, n_vertices - 1)))))
+    pts = np.array([[0.0, 0.0], [1.0, 0.0]])
+    rot = np.array([[0.5, -0.5], [0.5, 0.5]])  # 45° turn scaled by 1/sqrt(2)
+    for _ in range(level):
+        a, b = pts[:-1], pts[1:]
+        mid = a + (b - a) @ rot.T
+        out = np.empty((2 * a.shape[0] + 1, 2))
+        out[0:-1:2] = a
+        out[1::2] = mid
+        out[-1] = pts[-1]
+        pts = out
+    return pts, 2.0
+
+
+def random_walk(n_vertices):
+    """Gaussian random walk (seeded); the path of Brownian motion has dimension 2."""
+    rng = np.random.default_rng(12345)
+    return np.cumsum(rng.standard_normal((n_vertices, 2)), axis=0), 2.0
+
+
+def straight_line(n_vertices):
+    """Evenly spaced vertices on a diagonal line; dimension 1."""
+    t = np.linspace(0.0, 1.0, n_vertices)
+    return np.column_stack((t, 0.5 * t)), 1.0
+
+
+GENERATORS = {
+    "koch": koch_curve,
+    "levy": levy_c_curve,
+    "walk": random_walk,
+    "line": straight_line,
+}
+
+
+def linestring_wkb(xy):
+    return struct.pack("<BII", 1, 2, xy.shape[0]) + np.ascontiguousarray(xy, dtype="<f8").tobytes()
+
+
+def run_case(wkb, n_vertices, settings, min_time):
+    """Time estimate_wkb on one geometry, repeating small cases for at least min_time seconds."""
+    tracemalloc.start()
+    fd, r2 = core.estimate_wkb(wkb, 0, settings)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    runs = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while runs == 0 or elapsed < min_time:
+        core.estimate_wkb(wkb, runs, settings)
+        runs += 1
+        elapsed = time.perf_counter() - start
+
+    per_feature = elapsed / runs
+    return {
+        "vertices": n_vertices,
+        "features_per_s": 1.0 / per_feature,
+        "vertices_per_s": n_vertices / per_feature,
+        "peak_mib": peak / 2.0 ** 20,
+        "dimension": fd,
+        "r2": r2,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Human-readable list of regressions against a recorded baseline."""
+    regressions = []
+    for name, cur in sorted(results.items()):
+        ref = baseline.get(name)
+        if ref is None:
+            continue
+        if cur["vertices_per_s"] < ref["vertices_per_s"] / (1.0 + tolerance):
+            regressions.append("%s: %.3g vertices/s, baseline %.3g" % (name, cur["vertices_per_s"], ref["vertices_per_s"]))
+        if cur["peak_mib"] > ref["peak_mib"] * (1.0 + tolerance) + 1.0:
+            regressions.append("%s: peak %.1f MiB, baseline %.1f MiB" % (name, cur["peak_mib"], ref["peak_mib"]))
+        if cur["abs_error"] > ref["abs_error"] + 0.02:
+            regressions.append("%s: |error| %.3f, baseline %.3f" % (name, cur["abs_error"], ref["abs_error"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Minkowski dimension estimator on curves of known dimension.")
+    parser.add_argument("--generators", nargs="+", choices=sorted(GENERATORS), default=sorted(GENERATORS))
+    parser.add_argument("--min-exp", type=int, default=2, help="smallest size as a power of ten of vertices (default: 2)")
+    parser.add_argument("--max-exp", type=int, default=7, help="largest size as a power of ten of vertices (default: 7)")
+    parser.add_argument("-k", "--scales", type=int, default=8)
+    parser.add_argument("-n", "--offsets", type=int, default=3)
+    parser.add_argument("--densify", type=float, default=0.5)
+    parser.add_argument("--cover", type=int, default=core.COVER_VERTICES, help="0 = vertices, 1 = exact traversal")
+    parser.add_argument("--ladder", type=int, default=core.LADDER_GEOMETRIC, help="0 = geometric, 1 = powers of two")
+    parser.add_argument("--tile-vertices", type=int, default=0, help="count in strips of about this many vertices (default: 0, off)")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to repeat each case for (default: 0.5)")
+    parser.add_argument("--save", help="write the results to this JSON file as a new baseline")
+    parser.add_argument("--baseline", help="compare against this JSON baseline and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown/memory growth (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    settings = core.Settings(args.scales, args.offsets, args.densify, args.cover, args.ladder, tile_vertices=args.tile_vertices)
+
+    results = {}
+    print("%-12s %10s %12s %14s %10s %8s %8s" % ("case", "vertices", "features/s", "vertices/s", "peak MiB", "dim", "error"))
+    for gen in args.generators:
+        for exp in range(args.min_exp, args.max_exp + 1):
+            xy, known = GENERATORS[gen](10 ** exp)
+            res = run_case(linestring_wkb(xy), xy.shape[0], settings, args.min_time)
+            res["known_dimension"] = known
+            res["abs_error"] = abs(res["dimension"] - known) if math.isfinite(res["dimension"]) else float("inf")
+            name = "%s-1e%d" % (gen, exp)
+            results[name] = res
+            print("%-12s %10d %12.2f %14.4g %10.1f %8.3f %+8.3f" % (
+                name, res["vertices"], res["features_per_s"], res["vertices_per_s"],
+                res["peak_mib"], res["dimension"], res["dimension"] - known))
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump({
+                "settings": settings._asdict(),
+                "machine": platform.platform(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "results": results,
+            }, fh, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        if baseline.get("settings") != settings._asdict():
+            print("warning: baseline was recorded with different settings %s" % baseline.get("settings"))
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print("\nRegressions against %s:" % args.baseline)
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("\nNo regressions against %s." % args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Minkowski Dimension Calculator: QGIS Plugin
+
+https://github.com/eduard-kazakov/minkowskiDimCalculator
+
+Eduard Kazakov | ee.kazakov@gmail.com
+
+Convergence of the grid offset samplers. The same curve is placed at a few
+random positions and rotations. For every placement, sampler and offset
+count, this measures the variance of the estimated dimension across sampler
+seeds, and averages it over the placements, so the spread between
+placements does not mask the offsets. A power law var = c * n^-a is fitted
+per sampler, and the offsets each sampler needs to match the fitted uniform
+variance at --reference offsets are read off the fitted curves.
+
+    python benchmarks/bench_offsets.py --curve koch --trials 20 --seeds 20
+"""
+
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import minkowski_dim_calculator_core as core  # noqa: E402
+from bench_estimator import GENERATORS  # noqa: E402
+
+SAMPLERS = [
+    ("uniform", core.SAMPLER_UNIFORM),
+    ("halton", core.SAMPLER_HALTON),
+    ("sobol", core.SAMPLER_SOBOL),
+    ("golden", core.SAMPLER_GOLDEN),
+]
+
+
+def placements(xy, trials, seed):
+    """The curve translated and rotated at random, once per trial."""
+    rng = np.random.default_rng(seed)
+    size = float(np.ptp(xy, axis=0).max())
+    for _ in range(trials):
+        a = rng.uniform(0.0, 2.0 * math.pi)
+        rot = np.array([[math.cos(a), -math.sin(a)], [math.sin(a), math.cos(a)]])
+        yield xy @ rot.T + rng.uniform(-size, size, 2)
+
+
+# Fitted exponents below this are too flat to read an offset count from
+MIN_EXPONENT = 0.1
+
+
+def power_fit(counts, values):
+    """Least-squares fit of log(var) = log(c) - a * log(n); returns (log c, a)."""
+    points = [(math.log(n), math.log(v)) for n, v in zip(counts, values) if v > 0.0]
+    if len(points) < 2:
+        return float("nan"), float("nan")
+    x, y = np.array(points).T
+    slope, intercept = np.polyfit(x, y, 1)
+    return float(intercept), float(-slope)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimator variance against the number of grid offsets, per sampler.")
+    parser.add_argument("--curve", choices=sorted(GENERATORS), default="koch")
+    parser.add_argument("--vertices", type=int, default=5000)
+    parser.add_argument("--trials", type=int, default=10, help="random placements of the curve (default: 10)")
+    parser.add_argument("--seeds", type=int, default=20, help="sampler seeds per placement (default: 20)")
+    parser.add_argument("--max-offsets", type=int, default=10)
+    parser.add_argument("--reference", type=int, default=10, help="uniform offset count to match (default: 10)")
+    parser.add_argument("-k", "--scales", type=int, default=8)
+    parser.add_argument("--ladder", type=int, default=core.LADDER_GEOMETRIC, help="0 = geometric, 1 = powers of two")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    xy, known = GENERATORS[args.curve](args.vertices)
+    shapes = list(placements(xy, args.trials, args.seed))
+    offsets = np.array([0, xy.shape[0]])
+    counts = list(range(1, args.max_offsets + 1))
+
+    variance = {}
+    for name, sampler in SAMPLERS:
+        for n in counts:
+            settings = core.Settings(k_scales=args.scales, n_offsets=n, scale_ladder=args.ladder, offset_sampler=sampler)
+            per_placement = []
+            means = []
+            for shape in shapes:
+                dims = [core.estimate_dimension(shape, offsets, seed, settings)[0] for seed in range(args.seeds)]
+                per_placement.append(np.var(dims))
+                means.append(np.mean(dims))
+            variance[name, n] = (float(np.mean(per_placement)), float(np.mean(means)))
+
+    print("%s, %d vertices, known dimension %.4f, %d placements x %d seeds"
+          % (args.curve, xy.shape[0], known, args.trials, args.seeds))
+    print("%8s" % "offsets" + "".join("%22s" % name for name, _ in SAMPLERS))
+    for n in counts:
+        print("%8d" % n + "".join("   var %.2e mean %.3f" % variance[name, n] for name, _ in SAMPLERS))
+
+    fits = {name: power_fit(counts, [variance[name, n][0] for n in counts]) for name, _ in SAMPLERS}
+    log_c, alpha = fits["uniform"]
+    if not alpha >= MIN_EXPONENT:
+        print("\nThe uniform variance hardly falls with more offsets; no offset counts to compare.")
+        return 0
+    log_target = log_c - alpha * math.log(args.reference)
+    print("\nOffsets needed to reach the fitted uniform variance at %d offsets (%.2e):"
+          % (args.reference, math.exp(log_target)))
+    for name, _ in SAMPLERS:
+        log_c, alpha = fits[name]
+        if not alpha >= MIN_EXPONENT:
+            print("  %-8s not reached: the variance hardly falls with more offsets" % name)
+            continue
+        # at least one offset; rounded first so the reference itself is not extrapolated
+        needed = max(1.0, round(math.exp((log_c - log_target) / alpha), 1))
+        note = " (extrapolated)" if needed > args.max_offsets else ""
+        print("  %-8s %5.1f offsets (%.0f %% fewer, var ~ n^-%.2f)%s"
+              % (name, needed, 100.0 * (args.reference - needed) / args.reference, alpha, note))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,13 +7,25 @@ https://github.com/eduard-kazakov/minkowskiDimCalculator
 Eduard Kazakov | ee.kazakov@gmail.com
 """
 
+import collections
+import concurrent.futures
+import itertools
 import math
+import multiprocessing
+import multiprocessing.spawn
 import os
+import queue
 import random
+import sys
+import threading
+import time
 from qgis.PyQt.QtCore import QMetaType
 from qgis.PyQt.QtGui import QIcon
 from qgis.core import (
+    NULL,
+    QgsCoordinateTransform,
     QgsFeature,
+    QgsFeatureRequest,
     QgsFeatureSink,
     QgsField,
     QgsFields,
@@ -21,35 +33,237 @@ from qgis.core import (
     QgsProcessing,
     QgsProcessingAlgorithm,
     QgsProcessingException,
+    QgsProcessingOutputNumber,
+    QgsProcessingOutputVectorLayer,
+    QgsProcessingParameterBoolean,
     QgsProcessingParameterFeatureSink,
     QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingParameterFileDestination,
     QgsProcessingParameterNumber,
     QgsProcessingParameterDefinition,
-    QgsProcessingParameterString
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterString,
+    QgsProcessingParameterVectorLayer,
+    QgsProcessingUtils,
+    QgsSpatialIndex,
+    QgsVectorDataProvider,
+    QgsWkbTypes
 )
+from . import minkowski_dim_calculator_core as core
+from .minkowski_dim_calculator_cache import ResultCache
+
+
+class FeatureBatchWriter(object):
+    """Collects output features and hands them to a sink in fixed-size chunks.
+
+    At most batch_size features are held at a time, so memory stays bounded
+    however large the layer is.
+    """
+
+    def __init__(self, sink, batch_size):
+        self.sink = sink
+        self.batch_size = batch_size
+        self._batch = []
+
+    def add(self, feature):
+        self._batch.append(feature)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            if not self.sink.addFeatures(self._batch, QgsFeatureSink.FastInsert):
+                raise QgsProcessingException("Failed to write features to the output sink (%s)" % self.sink.lastError())
+            self._batch = []
+
+
+class FeaturePrefetcher(object):
+    """Iterates features read ahead on a background thread.
+
+    Batches of batch_size features go through a queue of at most depth
+    batches, so provider I/O overlaps the counting of earlier features while
+    memory stays bounded. open_features is called with no arguments on the
+    thread that reads, so the feature iterator is created and used on one
+    thread only. With depth 0 the features are read in the calling thread.
+    Errors raised while reading are raised again in the caller, and the
+    reader stops as soon as the iteration ends or is abandoned.
+    """
+
+    _END = object()
+
+    def __init__(self, open_features, batch_size, depth):
+        self.open_features = open_features
+        self.batch_size = batch_size
+        self.depth = depth
+        self._queue = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read(self):
+        try:
+            features = iter(self.open_features())
+            while not self._stop.is_set():
+                batch = list(itertools.islice(features, self.batch_size))
+                if not batch:
+                    break
+                self._put(batch)
+        except Exception as e:
+            self._put(e)
+        self._put(self._END)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                pass
+
+    def __iter__(self):
+        if not self.depth:
+            yield from self.open_features()
+            return
+        self._queue = queue.Queue(maxsize=self.depth)
+        self._thread = threading.Thread(target=self._read, name="mink-prefetch", daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is self._END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield from item
+        finally:
+            self._stop.set()
+            self._thread.join()
+
 
 class MinkowskiDimCalculatorAlgorithm(QgsProcessingAlgorithm):
     INPUT = "INPUT"
     OUTPUT = "OUTPUT"
+    OUTPUT_MODE = "OUTPUT_MODE"
+    GROUP_FIELD = "GROUP_FIELD"
+    PER_PART = "PER_PART"
+    ZONES = "ZONES"
+    SWEEP_SCALES = "SWEEP_SCALES"
+    SWEEP_OFFSETS = "SWEEP_OFFSETS"
+    SWEEP_DENSIFY = "SWEEP_DENSIFY"
+    DIMENSION = "DIMENSION"
+    R2 = "R2"
     
     K_SCALES = "K_SCALES"
     N_OFFSETS = "N_OFFSETS"
+    OFFSET_SAMPLER = "OFFSET_SAMPLER"
+    ADAPTIVE_OFFSETS = "ADAPTIVE_OFFSETS"
+    OFFSET_PATIENCE = "OFFSET_PATIENCE"
+    OFFSET_TOLERANCE = "OFFSET_TOLERANCE"
     DENSIFY_FACTOR = "DENSIFY_FACTOR"
+    COVER_MODE = "COVER_MODE"
+    SCALE_LADDER = "SCALE_LADDER"
+    ENGINE = "ENGINE"
+    TILE_VERTICES = "TILE_VERTICES"
+    TILE_THREADS = "TILE_THREADS"
     
     DIM_FIELD = "DIM_FIELD"
     R2_FIELD = "R2_FIELD"
 
+    WORKERS = "WORKERS"
+    READ_AHEAD = "READ_AHEAD"
+    INSTRUMENT = "INSTRUMENT"
+    DIAGNOSTIC_FIELDS = "DIAGNOSTIC_FIELDS"
+    TRACK_CHANGES = "TRACK_CHANGES"
+    CACHE_FILE = "CACHE_FILE"
+    CACHE_MAX_ENTRIES = "CACHE_MAX_ENTRIES"
+
     R2_WARNING_THRESHOLD = 0.85
+    PARALLEL_BATCH_SIZE = 64
+    WRITE_BATCH_SIZE = 1000
+
+    MODE_FEATURES = 0
+    MODE_RESULTS = 1
+    MODE_AGGREGATE = 2
+    MODE_ZONES = 3
+    MODE_SWEEP = 4
 
     def initAlgorithm(self, config=None):
         self.addParameter(
             QgsProcessingParameterFeatureSource(
                 self.INPUT,
-                "Input linear layer",
-                [QgsProcessing.TypeVectorLine],
+                "Input linear or polygon layer",
+                [QgsProcessing.TypeVectorLine, QgsProcessing.TypeVectorPolygon],
             )
         )
-        
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.OUTPUT_MODE,
+                "Output",
+                options=[
+                    "Input features with dimension fields",
+                    "Results only (source feature id, dimension, R²), no geometry",
+                    "Layer aggregate (one dimension for the whole layer, or per group)",
+                    "Per zone (one dimension per polygon of the zones layer)",
+                    "Parameter sweep (one row per feature and parameter combination), no geometry",
+                ],
+                defaultValue=self.MODE_FEATURES,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.GROUP_FIELD,
+                "Group by field (layer aggregate only)",
+                parentLayerParameterName=self.INPUT,
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.PER_PART,
+                "One dimension per part of multipart features",
+                defaultValue=False,
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.ZONES,
+                "Zones (per zone only)",
+                [QgsProcessing.TypeVectorPolygon],
+                optional=True,
+            )
+        )
+
+        # Parameter sweep: comma-separated values, empty = the single value below
+        for name, label in (
+            (self.SWEEP_SCALES, "Sweep: numbers of scales (K), comma-separated"),
+            (self.SWEEP_OFFSETS, "Sweep: grid offsets per scale, comma-separated"),
+            (self.SWEEP_DENSIFY, "Sweep: densification factors, comma-separated"),
+        ):
+            self.addParameter(QgsProcessingParameterString(name, label, optional=True))
+
+        self._add_advanced_parameters()
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Minkowski dimension added",
+            )
+        )
+
+        self.addOutput(QgsProcessingOutputNumber(self.DIMENSION, "Layer dimension (layer aggregate without grouping)"))
+        self.addOutput(QgsProcessingOutputNumber(self.R2, "Layer R² (layer aggregate without grouping)"))
+
+    def _add_advanced_parameters(self, output_fields=True):
+        """Estimator, execution, cache and field name parameters, shared with the update algorithm.
+
+        output_fields adds the choices of extra output fields, which only a
+        new output layer can take.
+        """
         # Advanced: number of scales
         p_k = QgsProcessingParameterNumber(
             self.K_SCALES,
@@ -70,11 +284,56 @@ class MinkowskiDimCalculatorAlgorithm(QgsProcessingAlgorithm):
             type=QgsProcessingParameterNumber.Integer,
             defaultValue=3,
             minValue=1,
-            maxValue=10,
+            maxValue=100,
             optional=True,
         )
         p_no.setFlags(p_no.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
         self.addParameter(p_no)
+
+        # Advanced: how grid offsets are drawn
+        p_os = QgsProcessingParameterEnum(
+            self.OFFSET_SAMPLER,
+            "Grid offset sampling",
+            options=["Uniform random", "Halton sequence", "Sobol sequence", "Golden-ratio sequence"],
+            defaultValue=0,
+            optional=True,
+        )
+        p_os.setFlags(p_os.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_os)
+
+        # Advanced: adaptive early stopping of offsets
+        p_ao = QgsProcessingParameterBoolean(
+            self.ADAPTIVE_OFFSETS,
+            "Adaptive offsets (grid offsets per scale becomes the maximum)",
+            defaultValue=False,
+            optional=True,
+        )
+        p_ao.setFlags(p_ao.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_ao)
+
+        p_op = QgsProcessingParameterNumber(
+            self.OFFSET_PATIENCE,
+            "Adaptive offsets: stop after this many draws without a new minimum",
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=2,
+            minValue=1,
+            maxValue=100,
+            optional=True,
+        )
+        p_op.setFlags(p_op.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_op)
+
+        p_ot = QgsProcessingParameterNumber(
+            self.OFFSET_TOLERANCE,
+            "Adaptive offsets: stop when the relative spread of counts is within",
+            type=QgsProcessingParameterNumber.Double,
+            defaultValue=0.01,
+            minValue=0.0,
+            maxValue=1.0,
+            optional=True,
+        )
+        p_ot.setFlags(p_ot.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_ot)
         
         # Advanced: densification factor
         p_df = QgsProcessingParameterNumber(
@@ -88,7 +347,141 @@ class MinkowskiDimCalculatorAlgorithm(QgsProcessingAlgorithm):
         )
         p_df.setFlags(p_df.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
         self.addParameter(p_df)
+
+        # Advanced: spacing of box sizes
+        p_sl = QgsProcessingParameterEnum(
+            self.SCALE_LADDER,
+            "Scale ladder",
+            options=["Geometric (log-spaced)", "Powers of two (hierarchical)"],
+            defaultValue=0,
+            optional=True,
+        )
+        p_sl.setFlags(p_sl.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_sl)
+
+        # Advanced: how occupied cells are found
+        p_cm = QgsProcessingParameterEnum(
+            self.COVER_MODE,
+            "Cover mode",
+            options=["Vertices (densified)", "Exact segment traversal"],
+            defaultValue=0,
+            optional=True,
+        )
+        p_cm.setFlags(p_cm.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_cm)
+
+        # Advanced: box counting engine
+        p_en = QgsProcessingParameterEnum(
+            self.ENGINE,
+            "Box counting engine",
+            options=["Vectorized (NumPy)", "Reference (per-vertex loop)"],
+            defaultValue=0,
+            optional=True,
+        )
+        p_en.setFlags(p_en.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_en)
+
+        # Advanced: tiled counting of very large features
+        p_tv = QgsProcessingParameterNumber(
+            self.TILE_VERTICES,
+            "Count features with more vertices than this tile by tile (0 = never)",
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=0,
+            minValue=0,
+            optional=True,
+        )
+        p_tv.setFlags(p_tv.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_tv)
+
+        p_tt = QgsProcessingParameterNumber(
+            self.TILE_THREADS,
+            "Threads per tiled feature",
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=1,
+            minValue=1,
+            maxValue=256,
+            optional=True,
+        )
+        p_tt.setFlags(p_tt.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_tt)
         
+        # Advanced: parallel execution
+        p_wk = QgsProcessingParameterNumber(
+            self.WORKERS,
+            "Worker processes (1 = run in the current process)",
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=1,
+            minValue=1,
+            maxValue=256,
+            optional=True,
+        )
+        p_wk.setFlags(p_wk.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_wk)
+
+        p_ra = QgsProcessingParameterNumber(
+            self.READ_AHEAD,
+            "Batches of features read ahead on a background thread (0 = read in turn)",
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=4,
+            minValue=0,
+            maxValue=64,
+            optional=True,
+        )
+        p_ra.setFlags(p_ra.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_ra)
+
+        # Advanced: instrumentation
+        p_in = QgsProcessingParameterBoolean(
+            self.INSTRUMENT,
+            "Report time per stage and counters at the end of the run",
+            defaultValue=False,
+            optional=True,
+        )
+        p_in.setFlags(p_in.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_in)
+
+        if output_fields:
+            p_dg = QgsProcessingParameterBoolean(
+                self.DIAGNOSTIC_FIELDS,
+                "Add per-feature diagnostic fields (mink_ms, mink_nvert)",
+                defaultValue=False,
+                optional=True,
+            )
+            p_dg.setFlags(p_dg.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+            self.addParameter(p_dg)
+
+            # Advanced: fields for later incremental updates
+            p_tc = QgsProcessingParameterBoolean(
+                self.TRACK_CHANGES,
+                "Add change tracking fields for later updates (src_fid, mink_hash)",
+                defaultValue=False,
+                optional=True,
+            )
+            p_tc.setFlags(p_tc.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+            self.addParameter(p_tc)
+
+        # Advanced: persistent result cache
+        p_cf = QgsProcessingParameterFileDestination(
+            self.CACHE_FILE,
+            "Result cache file (SQLite, reused across runs)",
+            fileFilter="SQLite database (*.sqlite *.db)",
+            optional=True,
+            createByDefault=False,
+        )
+        p_cf.setFlags(p_cf.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_cf)
+
+        p_cs = QgsProcessingParameterNumber(
+            self.CACHE_MAX_ENTRIES,
+            "Result cache size (entries)",
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=1000000,
+            minValue=1,
+            optional=True,
+        )
+        p_cs.setFlags(p_cs.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(p_cs)
+
         # Advanced: field names
         p_fd = QgsProcessingParameterString(
             self.DIM_FIELD,
@@ -107,22 +500,6 @@ class MinkowskiDimCalculatorAlgorithm(QgsProcessingAlgorithm):
         )
         p_r2.setFlags(p_r2.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
         self.addParameter(p_r2)
-        
-        self.addParameter(
-            QgsProcessingParameterFeatureSink(
-                self.OUTPUT,
-                "Minkowski dimension added",
-            )
-        )
-
-    @staticmethod
-    def _logspace_descending(s_max, s_min, k):
-        if k == 1:
-            return [s_min]
-        r = (s_min / float(s_max)) ** (1.0 / (k - 1))
-        vals = [s_max * (r ** i) for i in range(k)]
-        vals[-1] = s_min
-        return vals
 
     @staticmethod
     def _count_boxes_by_vertices(geom: QgsGeometry, s: float, shift_x: float, shift_y: float, densify_factor: float) -> int:
@@ -139,67 +516,788 @@ class MinkowskiDimCalculatorAlgorithm(QgsProcessingAlgorithm):
         else:
             g = geom
 
-        seen = set()
+        # Occupied cells as packed integers (a byte map when the grid over the
+        # bounding box is small) rather than a set of (ix, iy) tuples
+        bbox = g.boundingBox()
+        seen = core.CellSet(
+            (math.floor((bbox.xMinimum() - shift_x) / s), math.floor((bbox.xMaximum() - shift_x) / s)),
+            (math.floor((bbox.yMinimum() - shift_y) / s), math.floor((bbox.yMaximum() - shift_y) / s)),
+        )
         it = g.vertices()
         try:
             while True:
                 pt = next(it)
                 ix = math.floor((pt.x() - shift_x) / s)
                 iy = math.floor((pt.y() - shift_y) / s)
-                seen.add((ix, iy))
+                seen.add(ix, iy)
         except StopIteration:
             pass
         return len(seen)
 
     @staticmethod
-    def _ols_slope_r2(xs, ys):
-        n = len(xs)
-        if n < 2:
-            return float("nan"), float("nan")
-        mx = sum(xs)/n
-        my = sum(ys)/n
-        num = sum((x-mx)*(y-my) for x,y in zip(xs,ys))
-        den = sum((x-mx)**2 for x in xs)
-        if den == 0:
-            return float("nan"), float("nan")
-        b = num/den
-        a = my - b*mx
-        ss_tot = sum((y-my)**2 for y in ys)
-        ss_res = sum((y-(a+b*x))**2 for x,y in zip(xs,ys))
-        r2 = 1.0 - (ss_res/ss_tot if ss_tot != 0 else float("nan"))
-        return b, r2
+    def _linear_wkb(geom: QgsGeometry) -> bytes:
+        """WKB of a geometry, with curves segmentized so that the core can decode it."""
+        if QgsWkbTypes.isCurvedType(geom.wkbType()):
+            geom = QgsGeometry(geom.constGet().segmentize())
+        return bytes(geom.asWkb())
 
     @staticmethod
-    def _vertex_count(geom: QgsGeometry) -> int:
-        c = 0
-        it = geom.vertices()
+    def _python_executable():
+        """Interpreter for worker processes; inside QGIS sys.executable is the QGIS binary itself."""
+        exe = sys.executable
+        if os.path.basename(exe).lower().startswith("python"):
+            return exe
+        for name in ("pythonw.exe", "python.exe", os.path.join("bin", "python3")):
+            candidate = os.path.join(sys.exec_prefix, name)
+            if os.path.exists(candidate):
+                return candidate
+        return exe
+
+    def _estimate_reference(self, geom, seed, settings, extent, diagnostics):
+        """Per-vertex reference estimate, densified once at the finest scale like the vectorized engine."""
+        s_max, s_min = core.scale_range(*extent, settings.k_scales)
+        sizes = core.box_sizes(s_max, s_min, settings)
+
+        if settings.densify_factor > 0.0:
+            try:
+                geom = geom.densifyByDistance(max(1e-12, s_min * settings.densify_factor))
+            except Exception:
+                pass
+
+        rng = random.Random(seed)
+        if settings.scale_ladder == core.LADDER_DYADIC:
+            # One chain of offsets over the coarsest box counts every level,
+            # as the vectorized engine derives the levels from one grid
+            count = lambda dx, dy: [self._count_boxes_by_vertices(geom, s, dx, dy, 0.0) for s in sizes]
+            min_counts, used = core.sample_offsets(count, sizes[0], rng, settings)
+            diagnostics["offsets"] += used * len(sizes)
+            return core.fit_dimension(sizes, min_counts)
+
+        min_counts = []
+        for s in sizes:
+            count = lambda dx, dy: [self._count_boxes_by_vertices(geom, s, dx, dy, 0.0)]
+            (best,), used = core.sample_offsets(count, s, rng, settings)
+            min_counts.append(best)
+            diagnostics["offsets"] += used
+        return core.fit_dimension(sizes, min_counts)
+
+    @staticmethod
+    def _split_parts(features):
+        """Yield every part of multipart features as a copy of the feature with the same id; single-part features pass through."""
+        for f in features:
+            geom = f.geometry()
+            if not geom or geom.isEmpty() or not geom.isMultipart():
+                yield f
+                continue
+            collection = geom.constGet()
+            for i in range(collection.numGeometries()):
+                part = QgsFeature(f)
+                part.setGeometry(QgsGeometry(collection.geometryN(i).clone()))
+                yield part
+
+    def _read(self, src, request, read_ahead, per_part=False):
+        """Iterator over the features of src for request, read read_ahead batches ahead on a background thread.
+
+        The provider iterator is opened on that thread as well. With per_part,
+        multipart features are split into their parts there too.
+        """
+        def open_features():
+            features = src.getFeatures(request)
+            return self._split_parts(features) if per_part else features
+
+        return iter(FeaturePrefetcher(open_features, self.PARALLEL_BATCH_SIZE, read_ahead))
+
+    def _estimate_serial(self, src, settings, engine, feedback, profile, cache=None, request=None, read_ahead=0, per_part=False, keys=False):
+        """Yield (feature, dimension, r2, elapsed ms, vertex count, grid counts, key) for every input feature, counted in this process.
+
+        key is the feature's result cache key, made once for the cache lookup
+        and for mink_hash; it is None unless the cache is on or keys is set.
+        """
+        reference = engine == 1 and settings.cover_mode == core.COVER_VERTICES
+        features = self._read(src, request or QgsFeatureRequest(), read_ahead, per_part)
+        while True:
+            with profile.stage("read"):
+                f = next(features, None)
+            if f is None or feedback.isCanceled():
+                break
+
+            feedback.setProgressText('Processing feature %s' % f.id())
+
+            geom = f.geometry()
+            fd = float("nan")
+            r2 = float("nan")
+            vcount = 0
+            diagnostics = {"offsets": None}
+            key = None
+            start = time.perf_counter()
+
+            if not geom or geom.isEmpty():
+                if keys:
+                    key = self._result_key(b"", f.id(), settings, reference)
+            else:
+                try:
+                    seed = core.feature_seed(f.id())
+                    wkb = None
+                    cached = None
+                    if cache is not None or keys:
+                        with profile.stage("hash"):
+                            wkb = self._linear_wkb(geom)
+                            key = self._result_key(wkb, f.id(), settings, reference)
+                    if cache is not None:
+                        with profile.stage("cache"):
+                            cached = cache.get(key)
+
+                    if cached is not None:
+                        fd, r2 = cached
+                        vcount = geom.constGet().nCoordinates()
+                    else:
+                        # One decode of the WKB gives the coordinate buffer, and the vertex
+                        # count, length and bounds come from it without another vertex pass.
+                        with profile.stage("decode"):
+                            xy, parts = core.geometry_coordinates(wkb or self._linear_wkb(geom))
+                        with profile.stage("extent"):
+                            extent = core.geometry_extent(xy, parts)
+                        vcount = extent[3]
+                        diagnostics["offsets"] = 0
+                        if reference:
+                            with profile.stage("reference count"):
+                                fd, r2 = self._estimate_reference(geom, seed, settings, extent, diagnostics)
+                            profile.count("vertices scanned", vcount)
+                        else:
+                            fd, r2 = core.estimate_dimension(xy, parts, seed, settings, extent, profile, diagnostics)
+                        if cache is not None:
+                            with profile.stage("cache"):
+                                cache.put(key, fd, r2)
+                except Exception as e:
+                    feedback.setProgressText('Feature %s skipped due to processing error (%s)' % (f.id(), str(e)))
+
+            profile.count("features")
+            yield f, fd, r2, 1000.0 * (time.perf_counter() - start), vcount, diagnostics["offsets"], key
+
+    def _estimate_parallel(self, src, settings, workers, feedback, profile, cache=None, request=None, read_ahead=0, per_part=False, keys=False):
+        """Yield (feature, dimension, r2, elapsed ms, vertex count, grid counts, key) in input order, counting batches of features in a process pool.
+
+        Geometries travel to the workers as WKB with their feature ids, so the
+        workers need no QGIS and seed their offsets exactly like the serial path.
+        At most two batches per worker are in flight, which bounds memory.
+        Worker stage times are merged into profile, summed over processes.
+        Cache hits are resolved here and never sent to the workers. key is
+        as in _estimate_serial.
+        """
+        ctx = multiprocessing.get_context("spawn")
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+
+        # The spawn executable is process-wide; it is only replaced when QGIS
+        # is not itself a Python interpreter, and given back when the run ends
+        executable = self._python_executable()
+        previous = None
+        if executable != sys.executable:
+            previous = multiprocessing.spawn.get_executable()
+            ctx.set_executable(executable)
+
+        features = self._read(src, request or QgsFeatureRequest(), read_ahead, per_part)
+        pending = collections.deque()
+        exhausted = False
         try:
             while True:
-                next(it)
-                c += 1
-        except StopIteration:
-            pass
-        return c
-    
+                while not exhausted and len(pending) < 2 * workers:
+                    with profile.stage("read"):
+                        batch = list(itertools.islice(features, self.PARALLEL_BATCH_SIZE))
+                    if not batch:
+                        exhausted = True
+                        break
+                    cached, payload, batch_keys, misses = [], [], [], []
+                    with profile.stage("encode"):
+                        for f in batch:
+                            geom = f.geometry()
+                            wkb = self._linear_wkb(geom) if geom and not geom.isEmpty() else None
+                            key = None
+                            if cache is not None or keys:
+                                key = self._result_key(wkb or b"", f.id(), settings, False)
+                            batch_keys.append(key)
+                            if wkb and cache is not None:
+                                hit = cache.get(key)
+                                if hit is not None:
+                                    cached.append(hit + (None, 0.0, geom.constGet().nCoordinates(), None))
+                                    continue
+                            cached.append(None)
+                            payload.append((f.id(), wkb))
+                            misses.append(key if wkb else None)
+                    future = pool.submit(core.estimate_batch, payload, settings, profile.enabled) if payload else None
+                    pending.append((batch, cached, batch_keys, misses, future))
+
+                if not pending:
+                    break
+
+                batch, cached, batch_keys, misses, future = pending.popleft()
+                feedback.setProgressText('Processing features %s to %s' % (batch[0].id(), batch[-1].id()))
+                computed = iter(())
+                if future is not None:
+                    with profile.stage("wait for workers"):
+                        while not future.done():
+                            if feedback.isCanceled():
+                                return
+                            concurrent.futures.wait([future], timeout=0.2)
+
+                    results, batch_profile = future.result()
+                    if batch_profile is not None:
+                        profile.merge(batch_profile)
+                    computed = iter(results)
+                    if cache is not None:
+                        for key, (fd, r2, error, _, _, _) in zip(misses, results):
+                            if key is not None and error is None:
+                                cache.put(key, fd, r2)
+
+                for f, hit, key in zip(batch, cached, batch_keys):
+                    fd, r2, error, ms, vcount, n_offsets = hit if hit is not None else next(computed)
+                    if error is not None:
+                        feedback.setProgressText('Feature %s skipped due to processing error (%s)' % (f.id(), error))
+                    yield f, fd, r2, ms, vcount, n_offsets, key
+
+                if feedback.isCanceled():
+                    return
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            if previous is not None:
+                ctx.set_executable(previous)
+
+    def _aggregate(self, src, settings, group_field, dim_name, r2_name, parameters, context, feedback, profile, read_ahead=0):
+        """Layer aggregate mode: one dimension per layer, or per value of group_field."""
+        group_idx = src.fields().lookupField(group_field) if group_field else -1
+
+        out_fields = QgsFields()
+        if group_idx >= 0:
+            out_fields.append(QgsField(src.fields().at(group_idx)))
+        out_fields.append(QgsField(dim_name, QMetaType.Type.Double))
+        out_fields.append(QgsField(r2_name, QMetaType.Type.Double))
+        out_fields.append(QgsField("n_features", QMetaType.Type.LongLong))
+
+        sink, dest = self.parameterAsSink(
+            parameters, self.OUTPUT, context,
+            out_fields, QgsWkbTypes.NoGeometry, src.sourceCrs()
+        )
+        if sink is None:
+            raise QgsProcessingException("Failed to create output sink.")
+
+        # All features and groups are counted on grids built from the layer extent
+        extent = src.sourceExtent()
+        bounds = (extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum())
+        covers = {}
+
+        request = QgsFeatureRequest()
+        request.setSubsetOfAttributes([group_idx] if group_idx >= 0 else [])
+        total = src.featureCount() if src.featureCount() >= 0 else 0
+        features = self._read(src, request, read_ahead)
+        for processed in itertools.count(1):
+            with profile.stage("read"):
+                f = next(features, None)
+            if f is None or feedback.isCanceled():
+                break
+
+            geom = f.geometry()
+            if geom and not geom.isEmpty():
+                key = f.attribute(group_idx) if group_idx >= 0 else None
+                if key == NULL:
+                    key = None
+                cover = covers.get(key)
+                if cover is None:
+                    cover = covers[key] = core.LayerCover(bounds, settings)
+                try:
+                    with profile.stage("decode"):
+                        xy, parts = core.geometry_coordinates(self._linear_wkb(geom))
+                    with profile.stage("count"):
+                        cover.add(xy, parts)
+                    profile.count("vertices scanned", xy.shape[0])
+                except Exception as e:
+                    feedback.setProgressText('Feature %s skipped due to processing error (%s)' % (f.id(), str(e)))
+            profile.count("features")
+
+            if total:
+                feedback.setProgress(int(100.0 * processed / total))
+
+        results = {self.OUTPUT: dest}
+        writer = FeatureBatchWriter(sink, self.WRITE_BATCH_SIZE)
+        for key, cover in covers.items():
+            with profile.stage("fit"):
+                fd, r2 = cover.estimate()
+            if r2 < self.R2_WARNING_THRESHOLD:
+                feedback.pushWarning('r2 value for %s is below quality threshold (0.85)' % ("the layer" if group_idx < 0 else "group %s" % key))
+            feedback.pushInfo('Dimension %s: %.4f (R² %.4f, %d features)' % (
+                "of the layer" if group_idx < 0 else "of group %s" % key, fd, r2, cover.features))
+
+            newf = QgsFeature(out_fields)
+            attrs = [key] if group_idx >= 0 else []
+            attrs.append(fd if math.isfinite(fd) else None)
+            attrs.append(r2 if math.isfinite(r2) else None)
+            attrs.append(cover.features)
+            newf.setAttributes(attrs)
+            writer.add(newf)
+
+            if group_idx < 0:
+                results[self.DIMENSION] = fd
+                results[self.R2] = r2
+        writer.flush()
+        return results
+
+    @staticmethod
+    def _linear_parts(geom: QgsGeometry) -> QgsGeometry:
+        """The line parts of a clipped geometry; points where a line only touches the zone boundary are dropped."""
+        if QgsWkbTypes.geometryType(geom.wkbType()) == QgsWkbTypes.LineGeometry:
+            return geom
+        parts = [QgsGeometry(part.clone()) for part in geom.constParts()
+                 if QgsWkbTypes.geometryType(part.wkbType()) == QgsWkbTypes.LineGeometry]
+        return QgsGeometry.collectGeometry(parts) if parts else QgsGeometry()
+
+    def _zones(self, src, zones, settings, dim_name, r2_name, parameters, context, feedback, profile, read_ahead=0):
+        """Per zone mode: one dimension per zone polygon, from the input lines clipped to it.
+
+        The spatial index is built over the zones, which are few, so the
+        lines are streamed once: each line is clipped to the zones whose
+        bounding boxes it meets and its cells are merged into those zones'
+        covers. Box sizes come from each zone's extent.
+        """
+        out_fields = QgsFields(zones.fields())
+        out_fields.append(QgsField(dim_name, QMetaType.Type.Double))
+        out_fields.append(QgsField(r2_name, QMetaType.Type.Double))
+        out_fields.append(QgsField("n_features", QMetaType.Type.LongLong))
+
+        sink, dest = self.parameterAsSink(
+            parameters, self.OUTPUT, context,
+            out_fields, zones.wkbType(), zones.sourceCrs()
+        )
+        if sink is None:
+            raise QgsProcessingException("Failed to create output sink.")
+
+        # Zones are clipped against in the CRS of the lines
+        transform = None
+        if zones.sourceCrs() != src.sourceCrs():
+            transform = QgsCoordinateTransform(zones.sourceCrs(), src.sourceCrs(), context.transformContext())
+
+        index = QgsSpatialIndex()
+        covers = {}
+        zone_request = QgsFeatureRequest()
+        zone_request.setSubsetOfAttributes([])
+        with profile.stage("index"):
+            for zone in zones.getFeatures(zone_request):
+                geom = zone.geometry()
+                if not geom or geom.isEmpty():
+                    covers[zone.id()] = None
+                    continue
+                if transform is not None:
+                    geom = QgsGeometry(geom)
+                    geom.transform(transform)
+                bbox = geom.boundingBox()
+                engine = QgsGeometry.createGeometryEngine(geom.constGet())
+                engine.prepareGeometry()
+                cover = core.LayerCover(
+                    (bbox.xMinimum(), bbox.yMinimum(), bbox.xMaximum(), bbox.yMaximum()),
+                    settings, core.feature_seed(zone.id()),
+                )
+                covers[zone.id()] = (geom, engine, cover)
+                index.addFeature(zone.id(), bbox)
+        profile.count("zones", len(covers))
+
+        request = QgsFeatureRequest()
+        request.setSubsetOfAttributes([])
+        total = src.featureCount() if src.featureCount() >= 0 else 0
+        features = self._read(src, request, read_ahead)
+        for processed in itertools.count(1):
+            with profile.stage("read"):
+                f = next(features, None)
+            if f is None or feedback.isCanceled():
+                break
+
+            geom = f.geometry()
+            if geom and not geom.isEmpty():
+                try:
+                    # Polygons are clipped as their boundary rings, not as areas
+                    if QgsWkbTypes.geometryType(geom.wkbType()) == QgsWkbTypes.PolygonGeometry:
+                        geom = QgsGeometry(geom.constGet().boundary())
+                    for zone_id in index.intersects(geom.boundingBox()):
+                        zone_geom, engine, cover = covers[zone_id]
+                        with profile.stage("clip"):
+                            if not engine.intersects(geom.constGet()):
+                                continue
+                            if engine.contains(geom.constGet()):
+                                clipped = geom
+                            else:
+                                clipped = self._linear_parts(geom.intersection(zone_geom))
+                                if clipped.isEmpty():
+                                    continue
+                        with profile.stage("decode"):
+                            xy, parts = core.geometry_coordinates(self._linear_wkb(clipped))
+                        with profile.stage("count"):
+                            cover.add(xy, parts)
+                        profile.count("vertices scanned", xy.shape[0])
+                except Exception as e:
+                    feedback.setProgressText('Feature %s skipped due to processing error (%s)' % (f.id(), str(e)))
+            profile.count("features")
+
+            if total:
+                feedback.setProgress(int(100.0 * processed / total))
+
+        writer = FeatureBatchWriter(sink, self.WRITE_BATCH_SIZE)
+        for zone in zones.getFeatures():
+            entry = covers.get(zone.id())
+            fd, r2, n = float("nan"), float("nan"), 0
+            if entry is not None:
+                with profile.stage("fit"):
+                    fd, r2 = entry[2].estimate()
+                n = entry[2].features
+            if n and r2 < self.R2_WARNING_THRESHOLD:
+                feedback.pushWarning('r2 value for zone %s is below quality threshold (0.85)' % zone.id())
+
+            newf = QgsFeature(out_fields)
+            newf.setGeometry(zone.geometry())
+            attrs = zone.attributes()
+            attrs.append(fd if math.isfinite(fd) else None)
+            attrs.append(r2 if math.isfinite(r2) else None)
+            attrs.append(n)
+            newf.setAttributes(attrs)
+            writer.add(newf)
+        writer.flush()
+        return {self.OUTPUT: dest}
+
+    @staticmethod
+    def _sweep_values(text, cast, default, name):
+        """Values of a comma-separated sweep parameter; [default] when it is empty."""
+        items = [item.strip() for item in (text or "").replace(";", ",").split(",") if item.strip()]
+        try:
+            return [cast(item) for item in items] or [default]
+        except ValueError:
+            raise QgsProcessingException("%s is not a comma-separated list of numbers: %s" % (name, text))
+
+    def _sweep(self, src, configurations, dim_name, r2_name, parameters, context, feedback, profile, read_ahead=0):
+        """Parameter sweep mode: every configuration against coordinates read and decoded once.
+
+        The input is read once into a CoordinateStore, a memory-mapped file in
+        the Processing temporary folder, and each configuration then makes a
+        pass over views into it. Rows are written in long format, one per
+        configuration and feature, configuration by configuration.
+        """
+        out_fields = QgsFields()
+        out_fields.append(QgsField("src_fid", QMetaType.Type.LongLong))
+        out_fields.append(QgsField("k_scales", QMetaType.Type.Int))
+        out_fields.append(QgsField("n_offsets", QMetaType.Type.Int))
+        out_fields.append(QgsField("densify", QMetaType.Type.Double))
+        out_fields.append(QgsField(dim_name, QMetaType.Type.Double))
+        out_fields.append(QgsField(r2_name, QMetaType.Type.Double))
+
+        sink, dest = self.parameterAsSink(
+            parameters, self.OUTPUT, context,
+            out_fields, QgsWkbTypes.NoGeometry, src.sourceCrs()
+        )
+        if sink is None:
+            raise QgsProcessingException("Failed to create output sink.")
+
+        store = core.CoordinateStore(QgsProcessingUtils.tempFolder())
+        try:
+            request = QgsFeatureRequest()
+            request.setSubsetOfAttributes([])
+            features = self._read(src, request, read_ahead)
+            while True:
+                with profile.stage("read"):
+                    f = next(features, None)
+                if f is None or feedback.isCanceled():
+                    break
+                geom = f.geometry()
+                xy, parts = None, None
+                try:
+                    if geom and not geom.isEmpty():
+                        with profile.stage("decode"):
+                            xy, parts = core.geometry_coordinates(self._linear_wkb(geom))
+                except Exception as e:
+                    feedback.setProgressText('Feature %s skipped due to processing error (%s)' % (f.id(), str(e)))
+                with profile.stage("store"):
+                    store.append(f.id(), xy, parts)
+                profile.count("features")
+            store.finish()
+            feedback.pushInfo('Stored %d features for %d configurations' % (len(store), len(configurations)))
+
+            total = len(store) * len(configurations)
+            writer = FeatureBatchWriter(sink, self.WRITE_BATCH_SIZE)
+            for processed, (c, fid, fd, r2) in enumerate(core.sweep(store, configurations, profile), 1):
+                if feedback.isCanceled():
+                    break
+                settings = configurations[c]
+                with profile.stage("write"):
+                    newf = QgsFeature(out_fields)
+                    newf.setAttributes([
+                        fid, settings.k_scales, settings.n_offsets, settings.densify_factor,
+                        fd if math.isfinite(fd) else None,
+                        r2 if math.isfinite(r2) else None,
+                    ])
+                    writer.add(newf)
+                if total:
+                    feedback.setProgress(int(100.0 * processed / total))
+            with profile.stage("write"):
+                writer.flush()
+        finally:
+            store.close()
+        return {self.OUTPUT: dest}
+
+    @staticmethod
+    def _result_key(wkb, fid, settings, reference):
+        """Result cache key of a feature's linear WKB (b"" when empty), seed and parameters; mink_hash is its hex."""
+        return ResultCache.key(wkb, core.feature_seed(fid), *core.result_params(settings), reference)
+
+    def _change_hash(self, feature, settings, reference):
+        """mink_hash of a feature, for checking features that are not counted."""
+        geom = feature.geometry()
+        wkb = self._linear_wkb(geom) if geom and not geom.isEmpty() else b""
+        return self._result_key(wkb, feature.id(), settings, reference).hex()
+
+    def _update(self, src, layer, settings, reference, dim_name, r2_name, estimate, feedback, profile, read_ahead=0):
+        """Recount only new and modified input features into an existing output layer.
+
+        The layer must have been written with change tracking. Its src_fid
+        and mink_hash columns are read without geometry, and every input
+        feature is hashed, which is far cheaper than counting it. Features whose
+        id is new or whose hash differs are then counted, and the layer is
+        changed through its edit buffer and committed once; rows of deleted
+        features are removed. Any failure rolls the edits back. The hash
+        covers the parameters too, so a run with different parameters
+        recounts everything.
+        """
+        fields = layer.fields()
+        idx = {name: fields.lookupField(name) for name in ("src_fid", "mink_hash", dim_name, r2_name)}
+        missing = [name for name, i in idx.items() if i < 0]
+        if missing:
+            raise QgsProcessingException(
+                "%s has no %s field; write it once with change tracking first" % (layer.name(), ", ".join(missing)))
+        if fields.lookupField("mink_part") >= 0:
+            raise QgsProcessingException("%s has one row per part (mink_part); only whole-feature outputs can be updated" % layer.name())
+
+        provider = layer.dataProvider()
+        needed = QgsVectorDataProvider.ChangeAttributeValues | QgsVectorDataProvider.AddFeatures | QgsVectorDataProvider.DeleteFeatures
+        if (provider.capabilities() & needed) != needed:
+            raise QgsProcessingException("%s cannot be edited in place" % layer.name())
+
+        # src_fid -> (output fid, stored hash)
+        existing = {}
+        request = QgsFeatureRequest()
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes([idx["src_fid"], idx["mink_hash"]])
+        with profile.stage("read"):
+            for f in layer.getFeatures(request):
+                if f[idx["src_fid"]] != NULL:
+                    existing[int(f[idx["src_fid"]])] = (f.id(), f[idx["mink_hash"]])
+
+        targets = {}    # src fid -> output fid of modified features
+        hashes = {}     # src fid -> new hash of new and modified features
+        request = QgsFeatureRequest()
+        request.setSubsetOfAttributes([])
+        unchanged = 0
+        for f in self._read(src, request, read_ahead):
+            if feedback.isCanceled():
+                return
+            with profile.stage("hash"):
+                h = self._change_hash(f, settings, reference)
+            entry = existing.pop(f.id(), None)
+            if entry is not None and entry[1] == h:
+                unchanged += 1
+                continue
+            if entry is not None:
+                targets[f.id()] = entry[0]
+            hashes[f.id()] = h
+        deleted = [out_fid for out_fid, _ in existing.values()]
+        feedback.pushInfo('%d new, %d modified, %d deleted and %d unchanged features' % (
+            len(hashes) - len(targets), len(targets), len(deleted), unchanged))
+        if not hashes and not deleted:
+            return
+
+        if not layer.startEditing():
+            raise QgsProcessingException("%s cannot be edited" % layer.name())
+        try:
+            spatial = layer.isSpatial() and provider.capabilities() & QgsVectorDataProvider.ChangeGeometries
+            # Input attributes are copied into new rows by name, except into
+            # the layer's key columns (the GeoPackage fid), which its provider fills
+            key_columns = set(provider.pkAttributeIndexes())
+            copied = [field.name() for i, field in enumerate(fields)
+                      if i not in key_columns and src.fields().lookupField(field.name()) >= 0]
+            added = []
+            processed = 0
+            if hashes:
+                request = QgsFeatureRequest()
+                request.setFilterFids(list(hashes))
+                request.setSubsetOfAttributes(copied, src.fields())
+                for f, fd, r2, ms, vcount, n_offsets, _ in estimate(request):
+                    if feedback.isCanceled():
+                        break
+                    values = {
+                        dim_name: fd if math.isfinite(fd) else None,
+                        r2_name: r2 if math.isfinite(r2) else None,
+                        "mink_ms": ms,
+                        "mink_nvert": vcount,
+                        "mink_nofs": n_offsets,
+                        "src_fid": f.id(),
+                        "mink_hash": hashes[f.id()],
+                    }
+                    with profile.stage("write"):
+                        if f.id() in targets:
+                            changes = {i: values[name] for name, i in ((n, fields.lookupField(n)) for n in values) if i >= 0}
+                            if not layer.changeAttributeValues(targets[f.id()], changes):
+                                raise QgsProcessingException("Failed to update feature %s of %s" % (targets[f.id()], layer.name()))
+                            if spatial and not layer.changeGeometry(targets[f.id()], f.geometry()):
+                                raise QgsProcessingException("Failed to update feature %s of %s" % (targets[f.id()], layer.name()))
+                        else:
+                            newf = QgsFeature(fields)
+                            if layer.isSpatial():
+                                newf.setGeometry(f.geometry())
+                            for i, field in enumerate(fields):
+                                if field.name() in values:
+                                    newf.setAttribute(i, values[field.name()])
+                                elif field.name() in copied:
+                                    newf.setAttribute(i, f[field.name()])
+                            added.append(newf)
+                        if len(added) >= self.WRITE_BATCH_SIZE:
+                            if not layer.addFeatures(added):
+                                raise QgsProcessingException("Failed to add features to %s" % layer.name())
+                            del added[:]
+                    processed += 1
+                    feedback.setProgress(int(100.0 * processed / len(hashes)))
+
+            if feedback.isCanceled():
+                layer.rollBack()
+                return
+            with profile.stage("write"):
+                if added and not layer.addFeatures(added):
+                    raise QgsProcessingException("Failed to add features to %s" % layer.name())
+                if deleted and not layer.deleteFeatures(deleted):
+                    raise QgsProcessingException("Failed to delete features from %s" % layer.name())
+                if not layer.commitChanges():
+                    raise QgsProcessingException("Failed to save %s (%s)" % (layer.name(), "; ".join(layer.commitErrors())))
+        except Exception:
+            layer.rollBack()
+            raise
+        layer.triggerRepaint()
+
+    def _settings(self, parameters, context):
+        """core.Settings from the advanced estimator parameters."""
+        K_SCALES = int(self.parameterAsInt(parameters, self.K_SCALES, context) or 8)
+        N_OFFSETS = int(self.parameterAsInt(parameters, self.N_OFFSETS, context) or 3)
+        DF = float(self.parameterAsDouble(parameters, self.DENSIFY_FACTOR, context))
+        SCALE_LADDER = self.parameterAsEnum(parameters, self.SCALE_LADDER, context)
+        COVER_MODE = self.parameterAsEnum(parameters, self.COVER_MODE, context)
+        OFFSET_SAMPLER = self.parameterAsEnum(parameters, self.OFFSET_SAMPLER, context)
+        ADAPTIVE_OFFSETS = self.parameterAsBoolean(parameters, self.ADAPTIVE_OFFSETS, context)
+        OFFSET_PATIENCE = int(self.parameterAsInt(parameters, self.OFFSET_PATIENCE, context) or 2)
+        OFFSET_TOLERANCE = float(self.parameterAsDouble(parameters, self.OFFSET_TOLERANCE, context) or 0.0)
+        TILE_VERTICES = int(self.parameterAsInt(parameters, self.TILE_VERTICES, context) or 0)
+        TILE_THREADS = int(self.parameterAsInt(parameters, self.TILE_THREADS, context) or 1)
+
+        K_SCALES = max(2, K_SCALES)     # at least 2 points for a slope
+        N_OFFSETS = max(1, N_OFFSETS)
+        DF = max(0.0, DF) # allow 0 to disable densification
+
+        return core.Settings(
+            K_SCALES, N_OFFSETS, DF, COVER_MODE, SCALE_LADDER,
+            ADAPTIVE_OFFSETS, max(1, OFFSET_PATIENCE), max(0.0, OFFSET_TOLERANCE), OFFSET_SAMPLER,
+            max(0, TILE_VERTICES), max(1, TILE_THREADS),
+        )
+
+    def _estimator(self, src, settings, parameters, context, feedback, profile):
+        """(estimate, reference, cache) for the per-feature outputs.
+
+        estimate(request, per_part=False, keys=False) yields the results of
+        the requested features in input order, in this process or in worker
+        processes, with their change hash keys when keys is set;
+        reference tells whether the QGIS reference engine counts them, which
+        is part of the change hash; cache is the open result cache or None.
+        """
+        ENGINE = self.parameterAsEnum(parameters, self.ENGINE, context)
+        WORKERS = int(self.parameterAsInt(parameters, self.WORKERS, context) or 1)
+        READ_AHEAD = max(0, int(self.parameterAsInt(parameters, self.READ_AHEAD, context) or 0))
+        CACHE_FILE = self.parameterAsFileOutput(parameters, self.CACHE_FILE, context)
+        CACHE_MAX_ENTRIES = int(self.parameterAsInt(parameters, self.CACHE_MAX_ENTRIES, context) or 1000000)
+
+        if WORKERS > 1 and ENGINE == 1 and settings.cover_mode == core.COVER_VERTICES:
+            feedback.pushInfo('The reference engine needs QGIS and runs in a single process.')
+            WORKERS = 1
+        if settings.tile_vertices and ENGINE == 1 and settings.cover_mode == core.COVER_VERTICES:
+            feedback.pushInfo('Tiled counting needs the vectorized engine; the reference engine counts every feature at once.')
+        reference = WORKERS == 1 and ENGINE == 1 and settings.cover_mode == core.COVER_VERTICES
+
+        cache = ResultCache(CACHE_FILE, CACHE_MAX_ENTRIES) if CACHE_FILE else None
+
+        def estimate(request, per_part=False, keys=False):
+            if WORKERS > 1:
+                return self._estimate_parallel(src, settings, WORKERS, feedback, profile, cache, request, READ_AHEAD, per_part, keys)
+            return self._estimate_serial(src, settings, ENGINE, feedback, profile, cache, request, READ_AHEAD, per_part, keys)
+
+        return estimate, reference, cache
+
     def processAlgorithm(self, parameters, context, feedback):
         src = self.parameterAsSource(parameters, self.INPUT, context)
         if src is None:
             raise QgsProcessingException("Invalid input layer")
             
-        K_SCALES = int(self.parameterAsInt(parameters, self.K_SCALES, context) or 8)
-        N_OFFSETS = int(self.parameterAsInt(parameters, self.N_OFFSETS, context) or 3)
-        DF = float(self.parameterAsDouble(parameters, self.DENSIFY_FACTOR, context) or 0.5)
+        OUTPUT_MODE = self.parameterAsEnum(parameters, self.OUTPUT_MODE, context)
+        GROUP_FIELD = self.parameterAsString(parameters, self.GROUP_FIELD, context)
+        ADAPTIVE_OFFSETS = self.parameterAsBoolean(parameters, self.ADAPTIVE_OFFSETS, context)
+        READ_AHEAD = max(0, int(self.parameterAsInt(parameters, self.READ_AHEAD, context) or 0))
+        INSTRUMENT = self.parameterAsBoolean(parameters, self.INSTRUMENT, context)
+        DIAGNOSTIC_FIELDS = self.parameterAsBoolean(parameters, self.DIAGNOSTIC_FIELDS, context)
+        TRACK_CHANGES = self.parameterAsBoolean(parameters, self.TRACK_CHANGES, context)
+        PER_PART = self.parameterAsBoolean(parameters, self.PER_PART, context)
         
         dim_name_in = self.parameterAsString(parameters, self.DIM_FIELD, context) or "mink_dim"
         r2_name_in = self.parameterAsString(parameters, self.R2_FIELD, context) or "mink_r2"
 
-        out_fields = QgsFields(src.fields())
+        settings = self._settings(parameters, context)
+        profile = core.Profile() if INSTRUMENT else core.NO_PROFILE
+        run_start = time.perf_counter()
+
+        if OUTPUT_MODE in (self.MODE_AGGREGATE, self.MODE_ZONES, self.MODE_SWEEP):
+            if OUTPUT_MODE == self.MODE_SWEEP:
+                configurations = [
+                    settings._replace(k_scales=max(2, k), n_offsets=max(1, n), densify_factor=max(0.0, df))
+                    for k in self._sweep_values(self.parameterAsString(parameters, self.SWEEP_SCALES, context), int, settings.k_scales, "Sweep scales")
+                    for n in self._sweep_values(self.parameterAsString(parameters, self.SWEEP_OFFSETS, context), int, settings.n_offsets, "Sweep offsets")
+                    for df in self._sweep_values(self.parameterAsString(parameters, self.SWEEP_DENSIFY, context), float, settings.densify_factor, "Sweep densification")
+                ]
+                results = self._sweep(src, configurations, dim_name_in, r2_name_in, parameters, context, feedback, profile, READ_AHEAD)
+            elif OUTPUT_MODE == self.MODE_ZONES:
+                zones = self.parameterAsSource(parameters, self.ZONES, context)
+                if zones is None:
+                    raise QgsProcessingException("The per zone output needs a zones layer")
+                results = self._zones(src, zones, settings, dim_name_in, r2_name_in, parameters, context, feedback, profile, READ_AHEAD)
+            else:
+                results = self._aggregate(src, settings, GROUP_FIELD, dim_name_in, r2_name_in, parameters, context, feedback, profile, READ_AHEAD)
+            if profile.enabled:
+                feedback.pushInfo('Processed the layer in %.3f s' % (time.perf_counter() - run_start))
+                for line in profile.summary():
+                    feedback.pushInfo(line)
+            return results
+
+        if PER_PART and TRACK_CHANGES:
+            # Rows of one feature's parts would share a src_fid, which the update cannot tell apart
+            raise QgsProcessingException("Change tracking works on whole features; disable counting per part")
+
+        if OUTPUT_MODE == self.MODE_RESULTS:
+            out_fields = QgsFields()
+            out_fields.append(QgsField("src_fid", QMetaType.Type.LongLong))
+            out_wkb_type = QgsWkbTypes.NoGeometry
+        else:
+            out_fields = QgsFields(src.fields())
+            out_wkb_type = QgsWkbTypes.singleType(src.wkbType()) if PER_PART else src.wkbType()
+        if PER_PART:
+            out_fields.append(QgsField("mink_part", QMetaType.Type.Int))
         out_fields.append(QgsField(dim_name_in, QMetaType.Type.Double))
         out_fields.append(QgsField(r2_name_in, QMetaType.Type.Double))
+        if DIAGNOSTIC_FIELDS:
+            out_fields.append(QgsField("mink_ms", QMetaType.Type.Double))
+            out_fields.append(QgsField("mink_nvert", QMetaType.Type.LongLong))
+        if ADAPTIVE_OFFSETS:
+            out_fields.append(QgsField("mink_nofs", QMetaType.Type.Int))
+        if TRACK_CHANGES:
+            if OUTPUT_MODE != self.MODE_RESULTS:
+                out_fields.append(QgsField("src_fid", QMetaType.Type.LongLong))
+            out_fields.append(QgsField("mink_hash", QMetaType.Type.QString))
 
         sink, dest = self.parameterAsSink(
             parameters, self.OUTPUT, context,
-            out_fields, src.wkbType(), src.sourceCrs()
+            out_fields, out_wkb_type, src.sourceCrs()
         )
         if sink is None:
             raise QgsProcessingException("Failed to create output sink.")
@@ -207,75 +1305,67 @@ class MinkowskiDimCalculatorAlgorithm(QgsProcessingAlgorithm):
         total = src.featureCount() if src.featureCount() >= 0 else 0
         processed = 0
 
-        K_SCALES = max(2, K_SCALES)     # at least 2 points for a slope
-        N_OFFSETS = max(1, N_OFFSETS)
-        DF = max(0.0, DF) # allow 0 to disable densification
-
-        for f in src.getFeatures():
-            if feedback.isCanceled():
-                break
-
-            feedback.setProgressText('Processing feature %s' % f.id())
+        # Only the attributes the output carries are fetched from the provider
+        request = QgsFeatureRequest()
+        if OUTPUT_MODE == self.MODE_RESULTS:
+            request.setSubsetOfAttributes([])
 
-            geom = f.geometry()
-            fd = float("nan")
-            r2 = float("nan")
+        estimate, _, cache = self._estimator(src, settings, parameters, context, feedback, profile)
+        try:
+            results = estimate(request, PER_PART, TRACK_CHANGES)
 
-            if geom and not geom.isEmpty():
-                try:
-                    env = geom.boundingBox()
-                    w, h = env.width(), env.height()
-                    diag = math.hypot(w, h)
-
-                    length = geom.length()
-                    vcount = max(1, self._vertex_count(geom))
-                    seg = length / vcount if vcount > 0 else max(w, h)
-
-                    s_max = max(1e-9, 0.5 * max(1e-12, min(w, h) if (w > 0 and h > 0) else diag/2.0))
-
-                    s_min_by_span = s_max / (2 ** (K_SCALES - 1))
-                    s_min_by_seg  = max(1e-9, seg / 3.0)
-                    s_floor       = max(1e-9, s_max * 1e-3)
-                    s_min = max(s_min_by_span, s_min_by_seg, s_floor)
-                    if s_min >= s_max:
-                        s_min = s_max / 8.0
-
-                    sizes = self._logspace_descending(s_max, s_min, K_SCALES)
-
-                    rng = random.Random(int(f.id()) & 0xFFFFFFFF)
-
-                    log_inv_s, log_N = [], []
-                    for s in sizes:
-                        counts = []
-                        for _ in range(N_OFFSETS):
-                            dx = rng.uniform(0.0, s)
-                            dy = rng.uniform(0.0, s)
-                            counts.append(self._count_boxes_by_vertices(geom, s, dx, dy, DF))
-                        Nk = max(1, min(counts))
-                        log_inv_s.append(math.log(1.0 / s))
-                        log_N.append(math.log(float(Nk)))
-
-                    slope, r2 = self._ols_slope_r2(log_inv_s, log_N)
-                    if r2 < self.R2_WARNING_THRESHOLD:
-                        feedback.pushWarning('r2 value for this feature is below quality threshold (0.85). Please be aware using calculcated fractal dimension for it')
-                        
-                    fd = float(slope) if math.isfinite(slope) else float("nan")
+            writer = FeatureBatchWriter(sink, self.WRITE_BATCH_SIZE)
+            last_id, part = None, 0
+            for f, fd, r2, ms, vcount, n_offsets, key in results:
+                if r2 < self.R2_WARNING_THRESHOLD:
+                    feedback.pushWarning('r2 value for this feature is below quality threshold (0.85). Please be aware using calculcated fractal dimension for it')
 
-                except Exception as e:
-                    feedback.setProgressText('Feature %s skipped due to processing error (%s)' % (f.id(), str(e)))
+                with profile.stage("write"):
+                    newf = QgsFeature(out_fields)
+                    if OUTPUT_MODE == self.MODE_RESULTS:
+                        attrs = [f.id()]
+                    else:
+                        newf.setGeometry(f.geometry())
+                        attrs = f.attributes()
+                    if PER_PART:
+                        # parts of one feature arrive in order with the feature's id
+                        part = part + 1 if f.id() == last_id else 0
+                        last_id = f.id()
+                        attrs.append(part)
+                    attrs.append(fd if math.isfinite(fd) else None)
+                    attrs.append(r2 if math.isfinite(r2) else None)
+                    if DIAGNOSTIC_FIELDS:
+                        attrs.append(ms)
+                        attrs.append(vcount)
+                    if ADAPTIVE_OFFSETS:
+                        attrs.append(n_offsets)
+                    if TRACK_CHANGES:
+                        if OUTPUT_MODE != self.MODE_RESULTS:
+                            attrs.append(f.id())
+                        # None only when the geometry failed to export; the next update recounts it
+                        attrs.append(key.hex() if key is not None else None)
+                    newf.setAttributes(attrs)
+                    writer.add(newf)
 
-            newf = QgsFeature(out_fields)
-            newf.setGeometry(geom)
-            attrs = f.attributes()
-            attrs.append(fd if math.isfinite(fd) else None)
-            attrs.append(r2 if math.isfinite(r2) else None)
-            newf.setAttributes(attrs)
-            sink.addFeature(newf, QgsFeatureSink.FastInsert)
+                # progress follows input features, not the part rows written for them
+                if part == 0:
+                    processed += 1
+                    if total:
+                        feedback.setProgress(int(100.0 * processed / total))
 
-            processed += 1
+            with profile.stage("write"):
+                writer.flush()
+        finally:
+            # results not yet committed are saved even when the run fails
+            if cache is not None:
+                cache.close()
+        if cache is not None:
+            feedback.pushInfo(cache.summary())
 
-            if total:
-                feedback.setProgress(int(100.0 * processed / total))
+        if profile.enabled:
+            feedback.pushInfo('Processed %d features in %.3f s' % (processed, time.perf_counter() - run_start))
+            for line in profile.summary():
+                feedback.pushInfo(line)
 
         return {self.OUTPUT: dest}
     
@@ -288,19 +1378,62 @@ class MinkowskiDimCalculatorAlgorithm(QgsProcessingAlgorithm):
     def shortHelpString(self):
         return (
             "Automatically estimates the Minkowski fractal dimension for each feature (also known as Minkowski–Bouligand dimension, box-counting dimension).\n"
-            "Input is linear vector layer. Use built-in QGIS tool \"Polygons to lines\" to prepare polygon layers to be used in plugin.\n"
+            "Input is a linear or polygon vector layer. Polygons are measured by their boundary rings (exterior and holes), "
+            "read straight from the geometry, so no \"Polygons to lines\" pass is needed. Multipart features are counted as a whole, "
+            "or part by part with one output row per part, numbered in mink_part (feature and results outputs).\n"
             "Algorithm:\n"
             "  • Builds a per-feature geometric ladder of box sizes from the feature’s extent and typical segment length.\n"
             "  • For each size, samples several random grid offsets and takes the minimal cover.\n"
-            "  • Densifies vertices with max segment length = s * DENSIFY_FACTOR (0 disables densification).\n"
+            "  • Densifies vertices once per feature with max segment length = s_min * DENSIFY_FACTOR (0 disables densification).\n"
             "  • Fits log N(s) vs log(1/s) by OLS; slope is the dimension.\n\n"
+            "Output:\n"
+            "  • Input features: the input features with the fields below added.\n"
+            "  • Results only: a table of source feature id (src_fid) and the fields below, without geometry or source attributes, "
+            "to be joined back later.\n"
+            "  • Layer aggregate: one row with the dimension of all features counted together (an entire river network, say), "
+            "or one row per value of the group field. Every feature is read once and its occupied cells are merged into grids shared "
+            "by the whole layer, with box sizes from the layer extent. It is counted in this process with the vectorized engine, "
+            "uses every grid offset, and also returns the dimension and R² as algorithm results when not grouped.\n"
+            "  • Per zone: one row per polygon of the zones layer (watersheds, administrative units, ...) with the zone's attributes "
+            "and geometry and the dimension of the input lines clipped to it, with box sizes from the zone extent and n_features "
+            "counting the lines that reach it. The lines are read once for all zones and a spatial index of the zones picks "
+            "the candidates for each line, so no separate clip runs are needed.\n"
+            "  • Parameter sweep: one row per feature and parameter combination, without geometry (see below).\n\n"
             "Fields added (configurable names in Advanced):\n"
             "  • mink_dim   – estimated dimension\n"
             "  • mink_r2    – R² of the linear fit. Values below 0.85 should be considered as very unconfident\n\n"
             "Advanced parameters:\n"
             "  • Number of scales (K): more points along the log–log line (8–12 typical).\n"
             "  • Grid offsets per scale: mitigates grid alignment bias (3–5 typical).\n"
-            "  • Densification factor: controls vertex insertion density at each scale; 0.5 is a good default."
+            "  • Grid offset sampling: uniform random offsets, randomly shifted Halton or Sobol low-discrepancy points, "
+            "or a randomly shifted golden-ratio (plastic number) sequence. Low-discrepancy offsets reach a stable minimum with fewer offsets.\n"
+            "  • Adaptive offsets: stops sampling offsets at a scale once the minimum has not improved for the given number of draws, "
+            "or once (max - min) / min of the counts is within the tolerance; grid offsets per scale is the hard cap. "
+            "The grid counts made per feature are written to mink_nofs: one per box size and offset on either scale ladder, "
+            "so K × grid offsets per scale when no offset is skipped.\n"
+            "  • Scale ladder: log-spaced sizes, or powers of two of the finest size; with powers of two the coarser "
+            "counts are derived from the finest-scale occupancy instead of rescanning the geometry.\n"
+            "  • Densification factor: max segment length relative to the finest box size; 0.5 is a good default.\n"
+            "  • Cover mode: count cells holding (densified) vertices, or every cell the segments pass through exactly. "
+            "Exact traversal ignores the densification factor.\n"
+            "  • Box counting engine: vectorized NumPy counting (default) or the original per-vertex loop on QGIS geometries, kept as a reference; both densify once per feature and give the same counts.\n"
+            "  • Tiled counting: features with more vertices than the threshold are counted in strips of whole grid columns "
+            "of about that many vertices, so memory follows the strip size instead of the feature size; the counts are identical. "
+            "Strips of one feature can be counted on several threads.\n"
+            "  • Worker processes: counts batches of features in parallel processes; results keep the input order and are identical to a single-process run.\n"
+            "  • Read ahead: features are read from the provider on a background thread, this many batches ahead of the counting, "
+            "so that reading a GeoPackage or database overlaps the counting. Only the attributes the output needs are fetched.\n"
+            "  • Instrumentation: logs wall time per stage (read, decode, extent, densify, count, write, ...) and counters at the end of the run; "
+            "diagnostic fields add each feature's processing time in milliseconds (mink_ms) and vertex count (mink_nvert).\n"
+            "  • Parameter sweep: with the sweep output, every combination of the listed numbers of scales, grid offsets and densification factors "
+            "is run (an empty list uses the single value set here). The input is read and decoded once into a memory-mapped coordinate file "
+            "in the Processing temporary folder, and every combination counts from it. The result is a long table of src_fid, k_scales, n_offsets, "
+            "densify, mink_dim and mink_r2, counted in this process with the vectorized engine; the other advanced parameters apply to every combination.\n"
+            "  • Change tracking: adds the source feature id (src_fid) and mink_hash, a hash of the geometry and of all parameters above, "
+            "so that the layer can be refreshed later with the \"Update Minkowski dimension output\" algorithm. Only geometry changes are detected; with different parameters every feature is recounted. "
+            "Not available when counting per part.\n"
+            "  • Result cache: SQLite file keyed by a hash of the geometry and of the parameters above that change the result (not tiling or threads); unchanged features are not recomputed on the next run. "
+            "The least recently used entries beyond the cache size are evicted as the run goes."
         )
     
     def icon(self):
@@ -308,3 +1441,90 @@ class MinkowskiDimCalculatorAlgorithm(QgsProcessingAlgorithm):
 
     def createInstance(self):
         return MinkowskiDimCalculatorAlgorithm()
+
+
+class MinkowskiDimUpdateAlgorithm(MinkowskiDimCalculatorAlgorithm):
+    """Refreshes an output layer written with change tracking, in place.
+
+    It edits a layer of the project, so it runs on the main thread
+    (FlagNoThreading) and goes through the layer's edit buffer.
+    """
+
+    UPDATE_LAYER = "UPDATE_LAYER"
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                "Input linear or polygon layer",
+                [QgsProcessing.TypeVectorLine, QgsProcessing.TypeVectorPolygon],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                self.UPDATE_LAYER,
+                "Existing output layer written with change tracking",
+            )
+        )
+
+        self._add_advanced_parameters(output_fields=False)
+
+        self.addOutput(QgsProcessingOutputVectorLayer(self.OUTPUT, "Updated layer"))
+
+    def flags(self):
+        return super().flags() | QgsProcessingAlgorithm.FlagNoThreading
+
+    def processAlgorithm(self, parameters, context, feedback):
+        src = self.parameterAsSource(parameters, self.INPUT, context)
+        if src is None:
+            raise QgsProcessingException("Invalid input layer")
+        layer = self.parameterAsVectorLayer(parameters, self.UPDATE_LAYER, context)
+        if layer is None:
+            raise QgsProcessingException("Invalid layer to update")
+        if layer.isEditable():
+            raise QgsProcessingException("%s is in edit mode; save or discard its edits first" % layer.name())
+
+        READ_AHEAD = max(0, int(self.parameterAsInt(parameters, self.READ_AHEAD, context) or 0))
+        INSTRUMENT = self.parameterAsBoolean(parameters, self.INSTRUMENT, context)
+        dim_name_in = self.parameterAsString(parameters, self.DIM_FIELD, context) or "mink_dim"
+        r2_name_in = self.parameterAsString(parameters, self.R2_FIELD, context) or "mink_r2"
+
+        settings = self._settings(parameters, context)
+        profile = core.Profile() if INSTRUMENT else core.NO_PROFILE
+        run_start = time.perf_counter()
+
+        estimate, reference, cache = self._estimator(src, settings, parameters, context, feedback, profile)
+        try:
+            self._update(src, layer, settings, reference, dim_name_in, r2_name_in, estimate, feedback, profile, READ_AHEAD)
+        finally:
+            if cache is not None:
+                cache.close()
+        if cache is not None:
+            feedback.pushInfo(cache.summary())
+        if profile.enabled:
+            feedback.pushInfo('Updated the layer in %.3f s' % (time.perf_counter() - run_start))
+            for line in profile.summary():
+                feedback.pushInfo(line)
+        return {self.OUTPUT: layer.id()}
+
+    def name(self):
+        return "minkowski_dimension_update"
+
+    def displayName(self):
+        return "Update Minkowski dimension output"
+
+    def shortHelpString(self):
+        return (
+            "Refreshes a layer written by the Minkowski Dimension Calculator with change tracking (src_fid and mink_hash fields) "
+            "after the input layer was edited, instead of rerunning the whole layer.\n"
+            "Every input feature is hashed, which is far cheaper than counting it. Features with a new id or a changed geometry "
+            "are counted and written, rows of deleted features are removed, and the rest is left alone. The hash covers the "
+            "parameters too: use the same advanced parameters as the run that wrote the layer, or every feature is recounted.\n"
+            "The layer is edited in place through its edit buffer and saved once at the end, so this algorithm runs on the main "
+            "thread. It refuses a layer that is already in edit mode; save or discard those edits first. Nothing is saved if the "
+            "run fails or is canceled."
+        )
+
+    def createInstance(self):
+        return MinkowskiDimUpdateAlgorithm()
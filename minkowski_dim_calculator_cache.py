@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Minkowski Dimension Calculator: QGIS Plugin
+
+https://github.com/eduard-kazakov/minkowskiDimCalculator
+
+Eduard Kazakov | ee.kazakov@gmail.com
+
+Persistent result cache. Results are stored in a local SQLite file under a
+hash of the geometry WKB and every parameter that affects the estimate, so
+features that did not change since the previous run are not recomputed.
+"""
+
+import hashlib
+import math
+import sqlite3
+
+
+class ResultCache(object):
+    """Size-bounded, least-recently-used (dimension, r2) store in a SQLite file.
+
+    The bound is applied every COMMIT_EVERY operations, so the file never holds
+    more than max_entries plus one commit's worth of new entries.
+    """
+
+    COMMIT_EVERY = 5000
+
+    def __init__(self, path, max_entries=1000000):
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.entries = 0
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key BLOB PRIMARY KEY, dim REAL, r2 REAL, used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        (clock,) = self._conn.execute("SELECT COALESCE(MAX(used), 0) FROM results").fetchone()
+        self._clock = clock
+        self._touched = []
+        self._pending = 0
+
+    @staticmethod
+    def key(wkb, seed, *params):
+        """Cache key of one geometry under a seed and the estimator parameters."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((seed,) + params).encode("utf-8"))
+        h.update(wkb)
+        return h.digest()
+
+    def get(self, key):
+        """Cached (dimension, r2), or None on a miss."""
+        row = self._conn.execute("SELECT dim, r2 FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._clock += 1
+        self._touched.append((self._clock, key))
+        self._tick()
+        return tuple(float("nan") if v is None else v for v in row)
+
+    def put(self, key, dim, r2):
+        self._clock += 1
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results (key, dim, r2, used) VALUES (?, ?, ?, ?)",
+            (key, dim if math.isfinite(dim) else None, r2 if math.isfinite(r2) else None, self._clock),
+        )
+        self._tick()
+
+    def _tick(self):
+        self._pending += 1
+        if self._pending >= self.COMMIT_EVERY:
+            self.flush()
+
+    def flush(self):
+        """Commit, then evict the least recently used entries beyond max_entries."""
+        if self._touched:
+            self._conn.executemany("UPDATE results SET used = ? WHERE key = ?", self._touched)
+            self._touched = []
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            self.evicted += count - self.max_entries
+        self.entries = min(count, self.max_entries)
+        self._conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return 'Result cache: %d hits, %d misses (%.1f %% hit rate), %d entries kept, %d evicted' % (
+            self.hits, self.misses, rate, self.entries, self.evicted)
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Minkowski Dimension Calculator: QGIS Plugin
+
+https://github.com/eduard-kazakov/minkowskiDimCalculator
+
+Eduard Kazakov | ee.kazakov@gmail.com
+
+Command line entry point. Streams a vector layer (GeoPackage, Shapefile,
+GeoJSON or anything else OGR reads) through the QGIS-free estimator and writes
+one CSV row per feature. Needs NumPy and the GDAL Python bindings, not QGIS:
+
+    python minkowski_dim_calculator_cli.py rivers.gpkg -o rivers_dim.csv --workers 8
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import csv
+import itertools
+import math
+import multiprocessing
+import sys
+
+try:
+    from . import minkowski_dim_calculator_core as core
+except ImportError:
+    import minkowski_dim_calculator_core as core
+
+COVER_MODES = {"vertices": core.COVER_VERTICES, "traversal": core.COVER_TRAVERSAL}
+SCALE_LADDERS = {"geometric": core.LADDER_GEOMETRIC, "dyadic": core.LADDER_DYADIC}
+OFFSET_SAMPLERS = {
+    "uniform": core.SAMPLER_UNIFORM,
+    "halton": core.SAMPLER_HALTON,
+    "sobol": core.SAMPLER_SOBOL,
+    "golden": core.SAMPLER_GOLDEN,
+}
+
+BATCH_SIZE = 64
+
+
+def open_layer(path, layer_name=None):
+    """(data source, layer) of an OGR-readable file; keep the data source alive while reading the layer."""
+    try:
+        from osgeo import ogr
+    except ImportError:
+        raise SystemExit("The GDAL Python bindings (osgeo.ogr) are required to read vector files.")
+
+    ogr.UseExceptions()
+    ds = ogr.Open(path)
+    layer = ds.GetLayerByName(layer_name) if layer_name else ds.GetLayer(0)
+    if layer is None:
+        raise SystemExit("Layer %s not found in %s" % (layer_name, path))
+    return ds, layer
+
+
+def read_features(path, layer_name=None, group_field=None, per_part=False):
+    """Yield (fid, wkb) for every feature of a layer, one at a time; wkb is None for empty geometries.
+
+    With a group field, (fid, wkb, value of the field) is yielded instead.
+    With per_part, every part of a multipart feature is yielded in turn under
+    the feature's fid.
+    """
+    ds, layer = open_layer(path, layer_name)
+    for feature in layer:
+        fields = (feature.GetField(group_field),) if group_field else ()
+        geom = feature.GetGeometryRef()
+        if geom is None or geom.IsEmpty():
+            yield (feature.GetFID(), None) + fields
+            continue
+        if geom.HasCurveGeometry():
+            geom = geom.GetLinearGeometry()
+        if per_part and geom.GetGeometryCount() and "MULTI" in geom.GetGeometryName():
+            for i in range(geom.GetGeometryCount()):
+                yield (feature.GetFID(), bytes(geom.GetGeometryRef(i).ExportToIsoWkb())) + fields
+            continue
+        yield (feature.GetFID(), bytes(geom.ExportToIsoWkb())) + fields
+
+
+def aggregate_layer(path, layer_name, settings, group_field=None):
+    """[(group value, dimension, r2, feature count)] of all features counted together, or per group value."""
+    ds, layer = open_layer(path, layer_name)
+    xmin, xmax, ymin, ymax = layer.GetExtent()
+    covers = {}
+    for row in read_features(path, layer_name, group_field):
+        if row[1] is None:
+            continue
+        key = row[2] if group_field else None
+        if key not in covers:
+            covers[key] = core.LayerCover((xmin, ymin, xmax, ymax), settings)
+        covers[key].add(*core.geometry_coordinates(row[1]))
+    return [(key,) + cover.estimate() + (cover.features,) for key, cover in covers.items()]
+
+
+def sweep_layer(path, layer_name, configurations):
+    """Yield (settings, fid, dimension, r2) for every configuration and feature, decoding the layer only once."""
+    store = core.CoordinateStore()
+    try:
+        for fid, wkb in read_features(path, layer_name):
+            store.append(fid, *(core.geometry_coordinates(wkb) if wkb else (None, None)))
+        store.finish()
+        for c, fid, fd, r2 in core.sweep(store, configurations):
+            yield configurations[c], fid, fd, r2
+    finally:
+        store.close()
+
+
+def estimate_features(features, settings, workers=1, profile=None):
+    """Yield (fid, dimension, r2, error) in input order.
+
+    With several workers, batches go to a process pool with at most two
+    batches per worker in flight, so memory stays bounded on any layer size.
+    Stage timings are merged into profile when one is given.
+    """
+    batches = iter(lambda: list(itertools.islice(features, BATCH_SIZE)), [])
+    instrument = profile is not None
+
+    def results(batch, batch_results):
+        rows, batch_profile = batch_results
+        if batch_profile is not None:
+            profile.merge(batch_profile)
+        for (fid, _), row in zip(batch, rows):
+            yield (fid,) + tuple(row[:3])
+
+    if workers <= 1:
+        for batch in batches:
+            yield from results(batch, core.estimate_batch(batch, settings, instrument))
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        pending = collections.deque()
+        for batch in batches:
+            pending.append((batch, pool.submit(core.estimate_batch, batch, settings, instrument)))
+            if len(pending) >= 2 * workers:
+                batch, future = pending.popleft()
+                yield from results(batch, future.result())
+        while pending:
+            batch, future = pending.popleft()
+            yield from results(batch, future.result())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Minkowski (box-counting) dimension of every feature of a vector layer.")
+    parser.add_argument("input", help="input vector file (GeoPackage, Shapefile, GeoJSON, ...)")
+    parser.add_argument("--layer", help="layer name inside the input (default: first layer)")
+    parser.add_argument("-o", "--output", help="output CSV file (default: standard output)")
+    parser.add_argument("-k", "--scales", type=int, default=8, help="number of scales (default: 8)")
+    parser.add_argument("-n", "--offsets", type=int, default=3, help="grid offsets per scale (default: 3)")
+    parser.add_argument("--sampler", choices=sorted(OFFSET_SAMPLERS), default="uniform", help="grid offset sampling (default: uniform)")
+    parser.add_argument("--adaptive-offsets", action="store_true", help="stop sampling offsets early; --offsets becomes the maximum")
+    parser.add_argument("--patience", type=int, default=2, help="adaptive: draws without a new minimum before stopping (default: 2)")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="adaptive: relative spread of counts to stop at (default: 0.01)")
+    parser.add_argument("--densify", type=float, default=0.5, help="densification factor, 0 disables (default: 0.5)")
+    parser.add_argument("--cover", choices=sorted(COVER_MODES), default="vertices", help="cover mode (default: vertices)")
+    parser.add_argument("--ladder", choices=sorted(SCALE_LADDERS), default="geometric", help="scale ladder (default: geometric)")
+    parser.add_argument("--tile-vertices", type=int, default=0, help="count features with more vertices than this in strips (default: 0, never)")
+    parser.add_argument("--tile-threads", type=int, default=1, help="threads per tiled feature (default: 1)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument("--aggregate", action="store_true", help="one dimension for all features together instead of one per feature")
+    parser.add_argument("--group-by", help="with --aggregate: one dimension per value of this field")
+    parser.add_argument("--sweep-scales", type=int, nargs="+", help="sweep: numbers of scales to try (default: --scales)")
+    parser.add_argument("--sweep-offsets", type=int, nargs="+", help="sweep: grid offsets per scale to try (default: --offsets)")
+    parser.add_argument("--sweep-densify", type=float, nargs="+", help="sweep: densification factors to try (default: --densify)")
+    parser.add_argument("--per-part", action="store_true", help="one row per part of multipart features, numbered in a part column")
+    parser.add_argument("--profile", action="store_true", help="print time per stage and counters to standard error")
+    args = parser.parse_args(argv)
+
+    settings = core.Settings(
+        k_scales=max(2, args.scales),
+        n_offsets=max(1, args.offsets),
+        densify_factor=max(0.0, args.densify),
+        cover_mode=COVER_MODES[args.cover],
+        scale_ladder=SCALE_LADDERS[args.ladder],
+        adaptive_offsets=args.adaptive_offsets,
+        offset_patience=max(1, args.patience),
+        offset_tolerance=max(0.0, args.tolerance),
+        offset_sampler=OFFSET_SAMPLERS[args.sampler],
+        tile_vertices=max(0, args.tile_vertices),
+        tile_threads=max(1, args.tile_threads),
+    )
+
+    if args.sweep_scales or args.sweep_offsets or args.sweep_densify:
+        configurations = [
+            settings._replace(k_scales=max(2, k), n_offsets=max(1, n), densify_factor=max(0.0, df))
+            for k in args.sweep_scales or [settings.k_scales]
+            for n in args.sweep_offsets or [settings.n_offsets]
+            for df in args.sweep_densify or [settings.densify_factor]
+        ]
+        out = open(args.output, "w", newline="") if args.output else sys.stdout
+        try:
+            writer = csv.writer(out)
+            writer.writerow(["fid", "k_scales", "n_offsets", "densify", "mink_dim", "mink_r2"])
+            for config, fid, fd, r2 in sweep_layer(args.input, args.layer, configurations):
+                writer.writerow([
+                    fid, config.k_scales, config.n_offsets, config.densify_factor,
+                    repr(fd) if math.isfinite(fd) else "",
+                    repr(r2) if math.isfinite(r2) else "",
+                ])
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        return 0
+
+    if args.aggregate:
+        out = open(args.output, "w", newline="") if args.output else sys.stdout
+        try:
+            writer = csv.writer(out)
+            writer.writerow([args.group_by or "layer", "mink_dim", "mink_r2", "n_features"])
+            for key, fd, r2, count in aggregate_layer(args.input, args.layer, settings, args.group_by):
+                writer.writerow([
+                    key if args.group_by else args.layer or args.input,
+                    repr(fd) if math.isfinite(fd) else "",
+                    repr(r2) if math.isfinite(r2) else "",
+                    count,
+                ])
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        return 0
+
+    profile = core.Profile() if args.profile else None
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(["fid", "part", "mink_dim", "mink_r2"] if args.per_part else ["fid", "mink_dim", "mink_r2"])
+        features = read_features(args.input, args.layer, per_part=args.per_part)
+        last_fid, part = None, 0
+        for fid, fd, r2, error in estimate_features(features, settings, args.workers, profile):
+            if error is not None:
+                sys.stderr.write("Feature %s skipped due to processing error (%s)\n" % (fid, error))
+            # parts of one feature arrive in order under the feature's fid
+            part = part + 1 if fid == last_fid else 0
+            last_fid = fid
+            writer.writerow([fid] + ([part] if args.per_part else []) + [
+                repr(fd) if math.isfinite(fd) else "",
+                repr(r2) if math.isfinite(r2) else "",
+            ])
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if profile is not None:
+        sys.stderr.write("\n".join(profile.summary()) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1294 @@
+# -*- coding: utf-8 -*-
+"""
+Minkowski Dimension Calculator: QGIS Plugin
+
+https://github.com/eduard-kazakov/minkowskiDimCalculator
+
+Eduard Kazakov | ee.kazakov@gmail.com
+
+Array-based box counting and the dimension estimator. Nothing in this module
+depends on QGIS: geometries come in as WKB bytes and are handled as
+contiguous float64 coordinate arrays, so it can be used from worker
+processes, batch jobs and the command line:
+
+    from minkowski_dim_calculator_core import Settings, estimate_wkb, feature_seed
+    dim, r2 = estimate_wkb(wkb, feature_seed(fid), Settings(k_scales=10))
+"""
+
+import concurrent.futures
+import contextlib
+import itertools
+import math
+import os
+import random
+import struct
+import tempfile
+import time
+from array import array
+from collections import defaultdict, namedtuple
+
+import numpy as np
+
+# OGC WKB geometry type codes (2D base types)
+_WKB_POINT = 1
+_WKB_LINESTRING = 2
+_WKB_POLYGON = 3
+_WKB_MULTIPOINT = 4
+_WKB_MULTILINESTRING = 5
+_WKB_MULTIPOLYGON = 6
+_WKB_GEOMETRYCOLLECTION = 7
+
+# Choices of the Processing enum parameters, by index
+COVER_VERTICES = 0
+COVER_TRAVERSAL = 1
+
+LADDER_GEOMETRIC = 0
+LADDER_DYADIC = 1
+
+SAMPLER_UNIFORM = 0
+SAMPLER_HALTON = 1
+SAMPLER_SOBOL = 2
+SAMPLER_GOLDEN = 3
+
+Settings = namedtuple(
+    "Settings",
+    ["k_scales", "n_offsets", "densify_factor", "cover_mode", "scale_ladder",
+     "adaptive_offsets", "offset_patience", "offset_tolerance", "offset_sampler",
+     "tile_vertices", "tile_threads"],
+    defaults=[8, 3, 0.5, COVER_VERTICES, LADDER_GEOMETRIC, False, 2, 0.01, SAMPLER_UNIFORM, 0, 1],
+)
+Settings.__doc__ = "Estimator parameters, shared by the Processing algorithm and worker processes."
+
+
+def result_params(settings):
+    """The settings that can change an estimate, as a tuple for cache keys.
+
+    Tiling and threads never change the counts, the adaptive stopping
+    thresholds only matter with adaptive offsets, and the densification factor
+    only with the vertex cover.
+    """
+    return (
+        settings.k_scales,
+        settings.n_offsets,
+        settings.densify_factor if settings.cover_mode == COVER_VERTICES else 0.0,
+        settings.cover_mode,
+        settings.scale_ladder,
+        bool(settings.adaptive_offsets),
+        settings.offset_patience if settings.adaptive_offsets else 0,
+        settings.offset_tolerance if settings.adaptive_offsets else 0.0,
+        settings.offset_sampler,
+    )
+
+
+
+class Profile(object):
+    """Wall time per processing stage and event counters, accumulated over a run.
+
+    Profiles are picklable and can be merged, so worker processes return
+    their own and the caller folds them into one summary. A disabled profile
+    turns every call into a no-op.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.times = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - start
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] += n
+
+    def merge(self, other):
+        for name, t in other.times.items():
+            self.times[name] += t
+        for name, n in other.counters.items():
+            self.counters[name] += n
+
+    def summary(self):
+        """Report lines: stages by decreasing time, then counters."""
+        total = sum(self.times.values())
+        lines = ["Time per stage:"]
+        for name, t in sorted(self.times.items(), key=lambda item: -item[1]):
+            share = 100.0 * t / total if total > 0 else 0.0
+            lines.append("  %-22s %10.3f s  %5.1f %%" % (name, t, share))
+        lines.append("Counters:")
+        for name, n in sorted(self.counters.items()):
+            lines.append("  %-22s %12d" % (name, n))
+        return lines
+
+
+NO_PROFILE = Profile(enabled=False)
+
+# EWKB (PostGIS) flag bits
+_EWKB_Z = 0x80000000
+_EWKB_M = 0x40000000
+_EWKB_SRID = 0x20000000
+
+
+def _read_geometry(buf, pos, parts):
+    """Parse one WKB geometry starting at pos, appending (n, dim) coordinate views to parts."""
+    order = "<" if buf[pos] == 1 else ">"
+    (wkb_type,) = struct.unpack_from(order + "I", buf, pos + 1)
+    pos += 5
+
+    has_z = bool(wkb_type & _EWKB_Z)
+    has_m = bool(wkb_type & _EWKB_M)
+    if wkb_type & _EWKB_SRID:
+        pos += 4
+    wkb_type &= 0x0FFFFFFF
+
+    # ISO WKB: 1000 = Z, 2000 = M, 3000 = ZM
+    iso, base = divmod(wkb_type, 1000)
+    if iso in (1, 3):
+        has_z = True
+    if iso in (2, 3):
+        has_m = True
+    dim = 2 + int(has_z) + int(has_m)
+    dtype = np.dtype(order + "f8")
+
+    def coords(pos, n):
+        arr = np.frombuffer(buf, dtype=dtype, count=n * dim, offset=pos).reshape(n, dim)
+        return arr[:, :2], pos + 8 * n * dim
+
+    if base == _WKB_POINT:
+        pt, pos = coords(pos, 1)
+        if not np.isnan(pt).any():
+            parts.append(pt)
+    elif base == _WKB_LINESTRING:
+        (n,) = struct.unpack_from(order + "I", buf, pos)
+        ring, pos = coords(pos + 4, n)
+        parts.append(ring)
+    elif base == _WKB_POLYGON:
+        (n_rings,) = struct.unpack_from(order + "I", buf, pos)
+        pos += 4
+        for _ in range(n_rings):
+            (n,) = struct.unpack_from(order + "I", buf, pos)
+            ring, pos = coords(pos + 4, n)
+            parts.append(ring)
+    elif base in (_WKB_MULTIPOINT, _WKB_MULTILINESTRING, _WKB_MULTIPOLYGON, _WKB_GEOMETRYCOLLECTION):
+        (n_geoms,) = struct.unpack_from(order + "I", buf, pos)
+        pos += 4
+        for _ in range(n_geoms):
+            pos = _read_geometry(buf, pos, parts)
+    else:
+        raise ValueError("Unsupported WKB geometry type %d (curved geometries must be segmentized first)" % wkb_type)
+    return pos
+
+
+def geometry_coordinates(wkb):
+    """Decode linear WKB into a contiguous (N, 2) float64 array plus part offsets.
+
+    Every linestring or polygon ring becomes one part; part i occupies rows
+    offsets[i]:offsets[i + 1]. Z and M values are dropped.
+    """
+    buf = wkb if isinstance(wkb, (bytes, bytearray)) else bytes(wkb)
+    parts = []
+    _read_geometry(buf, 0, parts)
+
+    offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+    if parts:
+        np.cumsum([len(p) for p in parts], out=offsets[1:])
+        xy = np.empty((int(offsets[-1]), 2), dtype=np.float64)
+        for p, start, end in zip(parts, offsets[:-1], offsets[1:]):
+            xy[start:end] = p
+    else:
+        xy = np.empty((0, 2), dtype=np.float64)
+    return xy, offsets
+
+
+def cell_indices(xy, s, shift_x, shift_y):
+    """Integer grid indices of every vertex for box size s and grid origin (shift_x, shift_y)."""
+    ix = np.floor((xy[:, 0] - shift_x) / s).astype(np.int64)
+    iy = np.floor((xy[:, 1] - shift_y) / s).astype(np.int64)
+    return ix, iy
+
+
+def _pack_cells(ix, iy):
+    """Pack (ix, iy) pairs into int64 keys relative to the index minimum.
+
+    Returns (keys, ix_min, iy_min, ny), or None when the index span does not
+    fit in 63 bits.
+    """
+    ix_min = ix.min()
+    iy_min = iy.min()
+    dx = ix - ix_min
+    dy = iy - iy_min
+    nx = int(dx.max()) + 1
+    ny = int(dy.max()) + 1
+    if nx * ny >= 2 ** 63:
+        return None
+    return dx * ny + dy, ix_min, iy_min, ny
+
+
+def count_cells(ix, iy):
+    """Number of distinct (ix, iy) pairs.
+
+    Pairs are packed into single int64 keys and counted after an in-place
+    sort; falls back to row-wise np.unique when the index span does not fit
+    in 63 bits.
+    """
+    if ix.size == 0:
+        return 0
+    packed = _pack_cells(ix, iy)
+    if packed is None:
+        return int(np.unique(np.stack((ix, iy), axis=1), axis=0).shape[0])
+
+    keys = packed[0]
+    keys.sort()
+    return int(1 + np.count_nonzero(keys[1:] != keys[:-1]))
+
+
+def unique_cells(ix, iy):
+    """Distinct (ix, iy) pairs as two index arrays."""
+    if ix.size == 0:
+        return ix, iy
+    packed = _pack_cells(ix, iy)
+    if packed is None:
+        cells = np.unique(np.stack((ix, iy), axis=1), axis=0)
+        return cells[:, 0], cells[:, 1]
+
+    keys, ix_min, iy_min, ny = packed
+    keys = np.unique(keys)
+    return keys // ny + ix_min, keys % ny + iy_min
+
+
+_MORTON_BIAS = 1 << 31
+# (shift, mask) steps spreading 32 bits to the even bit positions, and back
+_MORTON_SPREAD = (
+    (16, 0x0000FFFF0000FFFF),
+    (8, 0x00FF00FF00FF00FF),
+    (4, 0x0F0F0F0F0F0F0F0F),
+    (2, 0x3333333333333333),
+    (1, 0x5555555555555555),
+)
+_MORTON_COMPACT = (
+    (1, 0x3333333333333333),
+    (2, 0x0F0F0F0F0F0F0F0F),
+    (4, 0x00FF00FF00FF00FF),
+    (8, 0x0000FFFF0000FFFF),
+    (16, 0x00000000FFFFFFFF),
+)
+
+
+def morton_keys(ix, iy):
+    """Z-order (Morton) keys of cell indices within [-2^31, 2^31), as uint64.
+
+    The bits of ix and iy are interleaved, so cells close on the grid get
+    close keys and a sorted key array walks the grid quadrant by quadrant.
+    """
+    keys = []
+    for v in (ix, iy):
+        v = (v + _MORTON_BIAS).astype(np.uint64)
+        for shift, mask in _MORTON_SPREAD:
+            v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+        keys.append(v)
+    return keys[0] | (keys[1] << np.uint64(1))
+
+
+def morton_cells(keys):
+    """Cell indices (ix, iy) of Morton keys; the inverse of morton_keys."""
+    cells = []
+    for v in (keys, keys >> np.uint64(1)):
+        v = v & np.uint64(0x5555555555555555)
+        for shift, mask in _MORTON_COMPACT:
+            v = (v | (v >> np.uint64(shift))) & np.uint64(mask)
+        cells.append(v.astype(np.int64) - _MORTON_BIAS)
+    return cells[0], cells[1]
+
+
+def _sorted_unique(keys):
+    """Sorted distinct values of a 1-D array that may be modified in place."""
+    keys.sort()
+    if keys.size < 2:
+        return keys
+    fresh = np.empty(keys.size, dtype=bool)
+    fresh[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=fresh[1:])
+    return keys[fresh]
+
+
+class CellSet(object):
+    """Set of occupied grid cells, one integer per cell instead of a tuple.
+
+    Cells are added one at a time (add) or as index arrays (update). Single
+    cells go to typed array('q') buffers first, so a per-vertex loop does not
+    allocate a tuple per vertex. When the index ranges are known and the
+    grid has at most BITMAP_CELLS cells, occupancy is a flat byte map.
+    Otherwise cells are kept as sorted runs of unique Morton keys, 8 bytes
+    per cell, and runs are merged once they outgrow the oldest one, so every
+    key is re-sorted only a logarithmic number of times. Indices beyond
+    ±2^31 fall back to sorted (ix, iy) rows.
+    """
+
+    BITMAP_CELLS = 1 << 23
+    BUFFER = 1 << 13
+
+    def __init__(self, ix_range=None, iy_range=None):
+        self._bx = array("q")
+        self._by = array("q")
+        self._room = self.BUFFER
+        self._bitmap = None
+        self._runs = []
+        self._pairs = None
+        if ix_range is not None and iy_range is not None:
+            x0, x1 = int(ix_range[0]), int(ix_range[1])
+            y0, y1 = int(iy_range[0]), int(iy_range[1])
+            if 0 < (x1 - x0 + 1) * (y1 - y0 + 1) <= self.BITMAP_CELLS:
+                self._bounds = (x0, x1, y0, y1)
+                self._bitmap = np.zeros((x1 - x0 + 1) * (y1 - y0 + 1), dtype=bool)
+
+    def add(self, ix, iy):
+        self._bx.append(ix)
+        self._by.append(iy)
+        self._room -= 1
+        if not self._room:
+            self._flush()
+
+    def update(self, ix, iy):
+        """Add every (ix[i], iy[i]) cell of two int64 index arrays."""
+        if ix.size == 0:
+            return
+        lo_x, hi_x, lo_y, hi_y = int(ix.min()), int(ix.max()), int(iy.min()), int(iy.max())
+
+        if self._bitmap is not None:
+            x0, x1, y0, y1 = self._bounds
+            if x0 <= lo_x and hi_x <= x1 and y0 <= lo_y and hi_y <= y1:
+                self._bitmap[(ix - x0) * (y1 - y0 + 1) + (iy - y0)] = True
+                return
+            # a cell outside the announced ranges: continue without the bitmap
+            held = np.flatnonzero(self._bitmap)
+            self._bitmap = None
+            self.update(held // (y1 - y0 + 1) + x0, held % (y1 - y0 + 1) + y0)
+
+        if self._pairs is None and -_MORTON_BIAS <= min(lo_x, lo_y) and max(hi_x, hi_y) < _MORTON_BIAS:
+            self._runs.append(_sorted_unique(morton_keys(ix, iy)))
+            while len(self._runs) > 1 and self._runs[-1].size >= self._runs[-2].size:
+                top = self._runs.pop()
+                self._runs[-1] = _sorted_unique(np.concatenate((self._runs[-1], top)))
+            return
+
+        if self._pairs is None:
+            keys = self._merged()
+            self._runs = []
+            self._pairs = np.stack(morton_cells(keys), axis=1)
+        self._pairs = np.unique(np.concatenate((self._pairs, np.stack((ix, iy), axis=1))), axis=0)
+
+    def _merged(self):
+        if len(self._runs) > 1:
+            self._runs = [_sorted_unique(np.concatenate(self._runs))]
+        return self._runs[0] if self._runs else np.empty(0, dtype=np.uint64)
+
+    def _flush(self):
+        if len(self._bx):
+            self.update(np.frombuffer(self._bx, dtype=np.int64), np.frombuffer(self._by, dtype=np.int64))
+            self._bx = array("q")
+            self._by = array("q")
+        self._room = self.BUFFER
+
+    def cells(self):
+        """Distinct cells held, as two index arrays."""
+        self._flush()
+        if self._bitmap is not None:
+            x0, x1, y0, y1 = self._bounds
+            held = np.flatnonzero(self._bitmap)
+            return held // (y1 - y0 + 1) + x0, held % (y1 - y0 + 1) + y0
+        if self._pairs is not None:
+            return self._pairs[:, 0], self._pairs[:, 1]
+        return morton_cells(self._merged())
+
+    def __len__(self):
+        self._flush()
+        if self._bitmap is not None:
+            return int(np.count_nonzero(self._bitmap))
+        if self._pairs is not None:
+            return int(self._pairs.shape[0])
+        return int(self._merged().size)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the occupancy and the pending buffers."""
+        held = self._bx.itemsize * (len(self._bx) + len(self._by))
+        for a in [self._bitmap, self._pairs] + self._runs:
+            if a is not None:
+                held += a.nbytes
+        return held
+
+
+def count_boxes(xy, s, shift_x, shift_y):
+    """Vertex-based cover: number of grid cells of size s holding at least one vertex."""
+    if xy.shape[0] == 0:
+        return 0
+    ix, iy = cell_indices(xy, s, shift_x, shift_y)
+    return count_cells(ix, iy)
+
+
+def _segment_ends(xy, offsets):
+    """Start and end points of every segment; segments never join two different parts."""
+    keep = np.ones(xy.shape[0] - 1, dtype=bool)
+    last = offsets[1:-1] - 1
+    keep[last[(last >= 0) & (last < keep.size)]] = False
+    return xy[:-1][keep], xy[1:][keep]
+
+
+def _crossed_cells(g0, g1, h0, h1, i0, i1):
+    """Cells entered where segments cross grid lines perpendicular to the g axis.
+
+    g and h are coordinates already expressed in cell units along the crossed
+    and the other axis; i0/i1 are the g-axis cell indices of the segment ends.
+    Returns (cell index along g, cell index along h) for every crossing.
+    """
+    n = np.abs(i1 - i0)
+    crossing = n > 0
+    g0, g1, h0, h1, i0, i1, n = (a[crossing] for a in (g0, g1, h0, h1, i0, i1, n))
+    total = int(n.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    seg = np.repeat(np.arange(n.size), n)
+    first = np.repeat(np.cumsum(n) - n, n)
+    k = np.arange(total, dtype=np.int64) - first + 1
+
+    step = np.sign(i1 - i0)[seg]
+    cell_g = i0[seg] + step * k
+    line_g = np.where(step > 0, cell_g, cell_g + 1)
+
+    t = (line_g - g0[seg]) / (g1 - g0)[seg]
+    cell_h = np.floor(h0[seg] + t * (h1 - h0)[seg]).astype(np.int64)
+    h_lo = np.floor(np.minimum(h0, h1)).astype(np.int64)[seg]
+    h_hi = np.floor(np.maximum(h0, h1)).astype(np.int64)[seg]
+    return cell_g, np.clip(cell_h, h_lo, h_hi)
+
+
+def traversal_cells(xy, offsets, s, shift_x, shift_y):
+    """Every grid cell passed through by the segments of a geometry (Amanatides–Woo traversal).
+
+    All segments are walked at once: the cell of each vertex plus, for each
+    grid line a segment crosses, the cell it enters. Work and memory are
+    proportional to the number of cells crossed; no densified copy of the
+    geometry is built. May contain duplicates.
+    """
+    gx = (xy[:, 0] - shift_x) / s
+    gy = (xy[:, 1] - shift_y) / s
+    ix = np.floor(gx).astype(np.int64)
+    iy = np.floor(gy).astype(np.int64)
+    if xy.shape[0] < 2:
+        return ix, iy
+
+    grid = np.column_stack((gx, gy))
+    (x0, y0), (x1, y1) = (a.T for a in _segment_ends(grid, offsets))
+    ix0, iy0 = np.floor(x0).astype(np.int64), np.floor(y0).astype(np.int64)
+    ix1, iy1 = np.floor(x1).astype(np.int64), np.floor(y1).astype(np.int64)
+
+    cx_x, cx_y = _crossed_cells(x0, x1, y0, y1, ix0, ix1)
+    cy_y, cy_x = _crossed_cells(y0, y1, x0, x1, iy0, iy1)
+    return np.concatenate((ix, cx_x, cy_x)), np.concatenate((iy, cx_y, cy_y))
+
+
+def count_boxes_traversal(xy, offsets, s, shift_x, shift_y):
+    """Exact cover: number of grid cells of size s that the geometry's segments pass through."""
+    if xy.shape[0] == 0:
+        return 0
+    return count_cells(*traversal_cells(xy, offsets, s, shift_x, shift_y))
+
+
+def densify(xy, offsets, max_length):
+    """Insert evenly spaced vertices so that no segment is longer than max_length.
+
+    Mirrors QgsGeometry.densifyByDistance: a segment of length L gets
+    floor(L / max_length) extra vertices, so it is split into that many plus
+    one equal pieces (one more than strictly needed when L is an exact
+    multiple of max_length). Returns a new (xy, offsets) pair.
+    """
+    n = xy.shape[0]
+    if n < 2 or max_length <= 0.0:
+        return xy, offsets
+
+    seg_len = np.hypot(*np.diff(xy, axis=0).T)
+    pieces = np.floor(seg_len / max_length).astype(np.int64) + 1
+    # the last vertex of each part starts no segment and is emitted once
+    per_vertex = np.ones(n, dtype=np.int64)
+    per_vertex[:-1] = pieces
+    last = offsets[1:] - 1
+    per_vertex[last[(last >= 0) & (last < n)]] = 1
+    if int(per_vertex.sum()) == n:
+        return xy, offsets
+
+    src = np.repeat(np.arange(n), per_vertex)
+    ends = np.cumsum(per_vertex)
+    k = np.arange(int(ends[-1])) - np.repeat(ends - per_vertex, per_vertex)
+    t = (k / per_vertex[src])[:, None]
+    nxt = np.minimum(src + 1, n - 1)
+    out = xy[src] + t * (xy[nxt] - xy[src])
+
+    new_offsets = np.concatenate(([0], ends))[offsets]
+    return out, new_offsets
+
+
+def count_boxes_pyramid(ix, iy, levels):
+    """Cell counts for `levels` box sizes s, 2s, 4s, ... from cell indices at the finest size s.
+
+    Each coarser level is the previous level's occupied cells shifted right
+    by one bit (floor division by two) and deduplicated, like a quadtree
+    pyramid, so the finest cells are the only full-size input. Valid because
+    every grid of size 2^k * s with the same origin nests in the finest one.
+    Returns counts from finest to coarsest.
+    """
+    counts = []
+    for level in range(levels):
+        if level:
+            ix = ix >> 1
+            iy = iy >> 1
+        ix, iy = unique_cells(ix, iy)
+        counts.append(int(ix.size))
+    return counts
+
+
+# Upper bound on offsets x vertices held at once by the batched counters
+MULTI_OFFSET_BUDGET = 1 << 22
+
+
+def _offset_chunks(n_offsets, n_vertices):
+    """Slices of the offsets axis small enough to stay within MULTI_OFFSET_BUDGET."""
+    step = max(1, MULTI_OFFSET_BUDGET // max(1, n_vertices))
+    for start in range(0, n_offsets, step):
+        yield slice(start, min(n_offsets, start + step))
+
+
+def cell_indices_multi(xy, s, shifts):
+    """Grid indices of every vertex for each of several grid origins; (n_offsets, n_vertices) arrays."""
+    ix = np.floor((xy[:, 0][None, :] - shifts[:, 0][:, None]) / s).astype(np.int64)
+    iy = np.floor((xy[:, 1][None, :] - shifts[:, 1][:, None]) / s).astype(np.int64)
+    return ix, iy
+
+
+def count_boxes_multi(xy, s, shifts):
+    """Vertex-based cover for a whole (n_offsets, 2) array of grid origins at once.
+
+    The coordinates are read once per chunk of offsets: cell indices for every
+    offset come from one broadcast over an offsets axis and are packed into
+    float64 keys in place (exact while the index span stays below 2^53), each
+    row is sorted and its distinct cells counted. Rows whose span is too wide
+    fall back to count_cells.
+    """
+    counts = np.zeros(shifts.shape[0], dtype=np.int64)
+    if xy.shape[0] == 0:
+        return counts
+    x = np.ascontiguousarray(xy[:, 0])
+    y = np.ascontiguousarray(xy[:, 1])
+    for chunk in _offset_chunks(shifts.shape[0], xy.shape[0]):
+        fx = x[None, :] - shifts[chunk, 0][:, None]
+        fx /= s
+        np.floor(fx, out=fx)
+        fy = y[None, :] - shifts[chunk, 1][:, None]
+        fy /= s
+        np.floor(fy, out=fy)
+        fx -= fx.min(axis=1, keepdims=True)
+        fy -= fy.min(axis=1, keepdims=True)
+        ny = fy.max() + 1.0
+        if (fx.max() + 1.0) * ny >= 2.0 ** 53:
+            ix, iy = cell_indices_multi(xy, s, shifts[chunk])
+            counts[chunk] = [count_cells(rx, ry) for rx, ry in zip(ix, iy)]
+            continue
+        fx *= ny
+        fx += fy
+        fx.sort(axis=1)
+        counts[chunk] = 1 + np.count_nonzero(fx[:, 1:] != fx[:, :-1], axis=1)
+    return counts
+
+
+def _column(x, s, shift):
+    """Grid column of coordinate x, computed exactly like cell_indices does."""
+    return math.floor((x - shift) / s)
+
+
+def _first_in_column(xs, s, shift, column, lo, hi):
+    """First index in [lo, hi) of the sorted xs whose grid column is >= column; hi if there is none."""
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _column(xs[mid], s, shift) < column:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _strips(xs, s, shift, budget, align, sizes=None):
+    """Cut the sorted xs into runs of about `budget` along grid column boundaries.
+
+    Entries count one each, or by their cumulative sizes when given. Yields
+    (start, end, first column, end column) with column bounds that are
+    multiples of align and follow each other without gaps; the first strip
+    starts and the last strip ends at None (unbounded). A group of `align`
+    columns is never split, even if it holds more than the budget.
+    """
+    n = xs.shape[0]
+    start = 0
+    c_lo = None
+    while start < n:
+        if sizes is None:
+            full = start + budget
+        else:
+            used = int(sizes[start - 1]) if start else 0
+            full = max(start + 1, int(np.searchsorted(sizes, used + budget, side="right")))
+        if full >= n:
+            yield start, n, c_lo, None
+            return
+        c_start = _column(xs[start], s, shift) // align * align
+        c_hi = _column(xs[full], s, shift) // align * align
+        if c_hi <= c_start:
+            c_hi = c_start + align
+        end = _first_in_column(xs, s, shift, c_hi, start, n)
+        if end == n:
+            yield start, n, c_lo, None
+            return
+        yield start, end, c_lo, c_hi
+        start = end
+        c_lo = c_hi
+
+
+class TiledCover(object):
+    """Box counting strip by strip, for single features too large to count at once.
+
+    The segments of the feature are sorted by their smaller x once. For every
+    box size and grid origin, the sorted run is cut into strips of whole grid
+    columns worth about `budget` vertices each. A strip's cells come from the
+    segments reaching into it, clipped to its columns, so every occupied cell
+    belongs to exactly one strip and the per-strip counts add up to the
+    monolithic count. Within a strip, segments are read in chunks of about
+    `budget` vertices and only the distinct cells seen so far are kept, so a
+    strip that cannot be cut further (one wide column at a coarse scale)
+    stays bounded too. With a vertex cover, densification (max_length, 0 for
+    none) happens per chunk with the same points densify() would insert; the
+    densified copy of the whole feature is never built. Strips are
+    independent and are counted on `threads` threads.
+    """
+
+    def __init__(self, xy, offsets, cover_mode, budget, threads=1, max_length=0.0):
+        self.budget = max(1, int(budget))
+        self.threads = max(1, int(threads))
+        self.traversal = cover_mode == COVER_TRAVERSAL
+
+        # Segment end coordinates, sorted by the smaller x, as contiguous rows
+        # x0, y0, x1, y1; single-vertex parts take part as zero-length segments.
+        # Every vertex starts a segment except the last one of each part, which
+        # is flagged in `tail`.
+        n = xy.shape[0]
+        keep = np.ones(max(0, n - 1), dtype=bool)
+        last = offsets[1:-1] - 1
+        keep[last[(last >= 0) & (last < keep.size)]] = False
+        single = offsets[:-1][np.diff(offsets) == 1]
+        starts = np.concatenate((np.flatnonzero(keep), single))
+        del keep
+        ends = starts + 1
+        ends[ends.size - single.size:] -= 1
+        tail = np.zeros(n, dtype=bool)
+        tail[offsets[1:][np.diff(offsets) > 1] - 1] = True
+        order = np.argsort(np.minimum(xy[starts, 0], xy[ends, 0]), kind="stable")
+        starts = starts[order]
+        ends = ends[order]
+        del order
+        self.tail = tail[ends] & (ends != starts)
+        del tail
+        self.segments = np.empty((4, starts.size))
+        for row, (index, axis) in enumerate(((starts, 0), (starts, 1), (ends, 0), (ends, 1))):
+            self.segments[row] = xy[index, axis]
+        del starts, ends
+        x0, x1 = self.segments[0], self.segments[2]
+        self.xs = np.minimum(x0, x1)
+        self.max_width = float(np.abs(x1 - x0).max()) if self.xs.size else 0.0
+
+        # Vertices each segment contributes after densification, as in densify()
+        self.pieces = None
+        self.sizes = None
+        self.n_vertices = n
+        if not self.traversal and max_length > 0.0:
+            length = np.hypot(x1 - x0, self.segments[3] - self.segments[1])
+            pieces = np.floor(length / max_length).astype(np.int64) + 1
+            del length
+            if pieces.size and int(pieces.max()) > 1:
+                self.pieces = pieces
+                self.sizes = np.cumsum(pieces)
+                self.n_vertices = int(self.sizes[-1]) + int(np.count_nonzero(self.tail))
+
+    def _map(self, func, strips):
+        if self.threads == 1:
+            return [func(strip) for strip in strips]
+        with concurrent.futures.ThreadPoolExecutor(self.threads) as pool:
+            return list(pool.map(func, strips))
+
+    def _chunks(self, first, end):
+        """Consecutive segment ranges of [first, end) worth about `budget` vertices each."""
+        while first < end:
+            if self.sizes is None:
+                stop = first + self.budget
+            else:
+                used = int(self.sizes[first - 1]) if first else 0
+                stop = max(first + 1, int(np.searchsorted(self.sizes, used + self.budget, side="right")))
+            yield first, min(stop, end)
+            first = stop
+
+    def _cells(self, first, end, c_lo, s, shift_x, shift_y):
+        """Cells of the segments in [first, end) that touch columns c_lo onwards, possibly with duplicates."""
+        x0, y0, x1, y1 = self.segments[:, first:end]
+        tail = self.tail[first:end]
+        pieces = None if self.pieces is None else self.pieces[first:end]
+        if c_lo is not None:
+            touching = np.floor((np.maximum(x0, x1) - shift_x) / s) >= c_lo
+            x0, y0, x1, y1, tail = x0[touching], y0[touching], x1[touching], y1[touching], tail[touching]
+            pieces = None if pieces is None else pieces[touching]
+
+        if self.traversal:
+            gx0, gy0 = (x0 - shift_x) / s, (y0 - shift_y) / s
+            gx1, gy1 = (x1 - shift_x) / s, (y1 - shift_y) / s
+            ix0, iy0 = np.floor(gx0).astype(np.int64), np.floor(gy0).astype(np.int64)
+            ix1, iy1 = np.floor(gx1).astype(np.int64), np.floor(gy1).astype(np.int64)
+            cx_x, cx_y = _crossed_cells(gx0, gx1, gy0, gy1, ix0, ix1)
+            cy_y, cy_x = _crossed_cells(gy0, gy1, gx0, gx1, iy0, iy1)
+            return np.concatenate((ix0, ix1[tail], cx_x, cy_x)), np.concatenate((iy0, iy1[tail], cx_y, cy_y))
+
+        px, py = x0, y0
+        if pieces is not None:
+            src = np.repeat(np.arange(pieces.size), pieces)
+            t = (np.arange(src.size) - np.repeat(np.cumsum(pieces) - pieces, pieces)) / pieces[src]
+            px = x0[src] + t * (x1 - x0)[src]
+            py = y0[src] + t * (y1 - y0)[src]
+        px = np.concatenate((px, x1[tail]))
+        py = np.concatenate((py, y1[tail]))
+        return np.floor((px - shift_x) / s).astype(np.int64), np.floor((py - shift_y) / s).astype(np.int64)
+
+    def _strip_chunks(self, strip, s, shift_x, shift_y):
+        """Cells of one strip, clipped to its columns, one chunk of segments at a time."""
+        start, end, c_lo, c_hi = strip
+
+        # Segments starting in earlier strips may reach into this one; none
+        # reaches further than the widest segment. The margin only has to cover
+        # rounding: segments not touching the strip are filtered out exactly.
+        first = 0
+        if c_lo is not None:
+            left = shift_x + c_lo * s
+            first = int(np.searchsorted(self.xs[:start], left - self.max_width - s * 1e-6 - abs(left) * 1e-12))
+
+        for a, b in self._chunks(first, end):
+            cx, cy = self._cells(a, b, c_lo, s, shift_x, shift_y)
+            if c_lo is not None or c_hi is not None:
+                inside = np.ones(cx.size, dtype=bool)
+                if c_lo is not None:
+                    inside &= cx >= c_lo
+                if c_hi is not None:
+                    inside &= cx < c_hi
+                cx, cy = cx[inside], cy[inside]
+            yield cx, cy
+
+    def _merge(self, chunks):
+        """Distinct cells of all chunks; merged whenever the distinct cells held exceed the budget."""
+        xs, ys, held = [], [], 0
+        for cx, cy in chunks:
+            cx, cy = unique_cells(cx, cy)
+            xs.append(cx)
+            ys.append(cy)
+            held += cx.size
+            if held > self.budget and len(xs) > 1:
+                cx, cy = unique_cells(np.concatenate(xs), np.concatenate(ys))
+                xs, ys, held = [cx], [cy], cx.size
+        if len(xs) == 1:
+            return xs[0], ys[0]
+        return unique_cells(np.concatenate(xs), np.concatenate(ys))
+
+    def _strip_count(self, strip, s, shift_x, shift_y):
+        chunks = self._strip_chunks(strip, s, shift_x, shift_y)
+        head = next(chunks)
+        following = next(chunks, None)
+        if following is None:
+            return count_cells(*head)
+        return self._merge(itertools.chain((head, following), chunks))[0].size
+
+    def count(self, s, shift_x, shift_y):
+        """Number of occupied cells of size s, like count_boxes or count_boxes_traversal."""
+        strips = list(_strips(self.xs, s, shift_x, self.budget, 1, self.sizes))
+        return sum(self._map(lambda strip: self._strip_count(strip, s, shift_x, shift_y), strips))
+
+    def count_pyramid(self, s, shift_x, shift_y, levels):
+        """count_boxes_pyramid over the whole feature; strips are aligned to the coarsest level."""
+        strips = list(_strips(self.xs, s, shift_x, self.budget, 1 << (levels - 1), self.sizes))
+        counts = self._map(lambda strip: count_boxes_pyramid(*self._merge(self._strip_chunks(strip, s, shift_x, shift_y)), levels), strips)
+        return [sum(level) for level in zip(*counts)] if counts else [0] * levels
+
+
+def logspace_descending(s_max, s_min, k):
+    if k == 1:
+        return [s_min]
+    r = (s_min / float(s_max)) ** (1.0 / (k - 1))
+    vals = [s_max * (r ** i) for i in range(k)]
+    vals[-1] = s_min
+    return vals
+
+
+def dyadic_descending(s_max, s_min, k):
+    """Box sizes s_min * 2^i, coarsest first, at most k of them and not above s_max."""
+    levels = max(2, min(k, int(math.floor(math.log2(s_max / s_min))) + 1))
+    return [s_min * (2 ** i) for i in reversed(range(levels))]
+
+
+def ols_slope_r2(xs, ys):
+    n = len(xs)
+    if n < 2:
+        return float("nan"), float("nan")
+    mx = sum(xs)/n
+    my = sum(ys)/n
+    num = sum((x-mx)*(y-my) for x,y in zip(xs,ys))
+    den = sum((x-mx)**2 for x in xs)
+    if den == 0:
+        return float("nan"), float("nan")
+    b = num/den
+    a = my - b*mx
+    ss_tot = sum((y-my)**2 for y in ys)
+    ss_res = sum((y-(a+b*x))**2 for x,y in zip(xs,ys))
+    r2 = 1.0 - (ss_res/ss_tot if ss_tot != 0 else float("nan"))
+    return b, r2
+
+
+def feature_seed(fid):
+    """RNG seed of a feature, so grid offsets depend only on its id."""
+    return int(fid) & 0xFFFFFFFF
+
+
+def geometry_extent(xy, offsets):
+    """(width, height, length, vertex count) of a coordinate buffer.
+
+    Computed with a handful of native array reductions over the buffer
+    instead of a Python-level walk over the vertices.
+    """
+    n = xy.shape[0]
+    if n == 0:
+        return 0.0, 0.0, 0.0, 0
+    lo = xy.min(axis=0)
+    hi = xy.max(axis=0)
+    length = 0.0
+    if n > 1:
+        d = np.diff(xy, axis=0)
+        seg_len = np.hypot(d[:, 0], d[:, 1])
+        # no segment joins the last vertex of a part to the first of the next
+        last = offsets[1:-1] - 1
+        seg_len[last[(last >= 0) & (last < n - 1)]] = 0.0
+        length = float(seg_len.sum())
+    return float(hi[0] - lo[0]), float(hi[1] - lo[1]), length, int(n)
+
+
+def scale_range(width, height, length, n_vertices, k_scales):
+    """(s_max, s_min) of the box-size ladder, from the feature extent and typical segment length."""
+    w, h = width, height
+    diag = math.hypot(w, h)
+
+    vcount = max(1, n_vertices)
+    seg = length / vcount if vcount > 0 else max(w, h)
+
+    s_max = max(1e-9, 0.5 * max(1e-12, min(w, h) if (w > 0 and h > 0) else diag/2.0))
+
+    s_min_by_span = s_max / (2 ** (k_scales - 1))
+    s_min_by_seg  = max(1e-9, seg / 3.0)
+    s_floor       = max(1e-9, s_max * 1e-3)
+    s_min = max(s_min_by_span, s_min_by_seg, s_floor)
+    if s_min >= s_max:
+        s_min = s_max / 8.0
+    return s_max, s_min
+
+
+def box_sizes(s_max, s_min, settings):
+    """Box sizes, coarsest first, for the ladder chosen in settings."""
+    if settings.scale_ladder == LADDER_DYADIC:
+        return dyadic_descending(s_max, s_min, settings.k_scales)
+    return logspace_descending(s_max, s_min, settings.k_scales)
+
+
+def fit_dimension(sizes, counts):
+    """(dimension, r2) from the OLS fit of log N(s) against log(1/s)."""
+    log_inv_s = [math.log(1.0 / s) for s in sizes]
+    log_N = [math.log(float(max(1, Nk))) for Nk in counts]
+    slope, r2 = ols_slope_r2(log_inv_s, log_N)
+    return (float(slope) if math.isfinite(slope) else float("nan")), r2
+
+
+# Plastic number, the two-dimensional generalisation of the golden ratio
+_GOLDEN_2D = 1.324717957244746
+_GOLDEN_A1 = 1.0 / _GOLDEN_2D
+_GOLDEN_A2 = 1.0 / (_GOLDEN_2D * _GOLDEN_2D)
+
+# Sobol direction numbers of the second dimension (primitive polynomial x + 1)
+_SOBOL_V = [1 << 31]
+for _ in range(31):
+    _SOBOL_V.append(_SOBOL_V[-1] ^ (_SOBOL_V[-1] >> 1))
+
+
+def _radical_inverse(i, base):
+    inv = 1.0 / base
+    f = inv
+    r = 0.0
+    while i > 0:
+        i, digit = divmod(i, base)
+        r += digit * f
+        f *= inv
+    return r
+
+
+def _sobol_2d(i):
+    x = 0
+    y = 0
+    k = 0
+    while i:
+        if i & 1:
+            x ^= 1 << (31 - k)
+            y ^= _SOBOL_V[k]
+        i >>= 1
+        k += 1
+    return x / 2.0 ** 32, y / 2.0 ** 32
+
+
+def offset_sequence(sampler, n, rng):
+    """Up to n grid offsets as fractions (u, v) of the box size, in [0, 1)².
+
+    Uniform draws two independent rng values per offset. Halton (bases 2, 3)
+    and Sobol points are Cranley–Patterson rotated by one rng draw per
+    sequence, so they stay deterministic per feature but differ between
+    features. The golden sampler is the open-ended additive recurrence
+    (0.5 + i / g, 0.5 + i / g²) mod 1 with g the plastic number, rotated the
+    same way; unlike a lattice sized for n it stays evenly spread when
+    adaptive stopping uses only a prefix. Generated lazily: values not
+    consumed are not drawn.
+    """
+    if sampler == SAMPLER_UNIFORM:
+        for _ in range(n):
+            yield rng.uniform(0.0, 1.0), rng.uniform(0.0, 1.0)
+        return
+
+    u0 = rng.random()
+    v0 = rng.random()
+    for i in range(n):
+        if sampler == SAMPLER_GOLDEN:
+            u, v = 0.5 + i * _GOLDEN_A1, 0.5 + i * _GOLDEN_A2
+        elif sampler == SAMPLER_SOBOL:
+            u, v = _sobol_2d(i)
+        else:
+            u, v = _radical_inverse(i + 1, 2), _radical_inverse(i + 1, 3)
+        yield (u + u0) % 1.0, (v + v0) % 1.0
+
+
+def sample_offsets(count, span, rng, settings):
+    """Minimal counts over grid offsets in [0, span)², drawn by settings.offset_sampler.
+
+    count(dx, dy) returns a list of counts (one per box size it covers).
+    All settings.n_offsets offsets are sampled, unless adaptive offsets are
+    enabled: then sampling stops early once no minimum has improved for
+    settings.offset_patience draws in a row, or once the relative spread
+    (max - min) / min of every count is within settings.offset_tolerance.
+    n_offsets stays the hard cap. Returns (minimal counts, offsets used).
+    """
+    best = None
+    highest = None
+    stale = 0
+    used = 0
+    for u, v in offset_sequence(settings.offset_sampler, settings.n_offsets, rng):
+        counts = count(u * span, v * span)
+        used += 1
+        if best is None:
+            best = list(counts)
+            highest = list(counts)
+            continue
+
+        improved = any(c < b for c, b in zip(counts, best))
+        best = [min(c, b) for c, b in zip(counts, best)]
+        highest = [max(c, h) for c, h in zip(counts, highest)]
+        if not settings.adaptive_offsets:
+            continue
+
+        stale = 0 if improved else stale + 1
+        spread = max((h - b) / float(max(1, b)) for h, b in zip(highest, best))
+        if stale >= settings.offset_patience or spread <= settings.offset_tolerance:
+            break
+    return best, used
+
+
+def min_counts(xy, offsets, sizes, rng, settings, tiles=None):
+    """Minimal cover over the sampled grid offsets for every box size, and the number of grid counts made.
+
+    The grid counts are one per box size and offset on both ladders, so
+    without adaptive offsets they are len(sizes) * settings.n_offsets.
+
+    On the geometric ladder with a vertex cover and a fixed number of
+    offsets, all offsets of a scale are counted in one batched pass over the
+    coordinates. Adaptive sampling needs each count before drawing the next
+    offset and exact traversal crosses different cells per offset, so both
+    count offsets one at a time.
+
+    When a TiledCover of the feature is given, every count goes through it.
+    """
+    if settings.scale_ladder == LADDER_DYADIC:
+        # Hierarchical: one finest-scale occupancy per offset, coarser levels
+        # derived from it. Offsets span the coarsest box so every level is shifted.
+        s_min = sizes[-1]
+
+        def count(dx, dy):
+            if tiles is not None:
+                return tiles.count_pyramid(s_min, dx, dy, len(sizes))[::-1]
+            if settings.cover_mode == COVER_TRAVERSAL:
+                ix, iy = traversal_cells(xy, offsets, s_min, dx, dy)
+            else:
+                ix, iy = cell_indices(xy, s_min, dx, dy)
+            return count_boxes_pyramid(ix, iy, len(sizes))[::-1]
+
+        best, used = sample_offsets(count, sizes[0], rng, settings)
+        return best, used * len(sizes)
+
+    batched = settings.cover_mode == COVER_VERTICES and not settings.adaptive_offsets and tiles is None
+    result = []
+    used = 0
+    for s in sizes:
+        if batched:
+            shifts = np.array(list(offset_sequence(settings.offset_sampler, settings.n_offsets, rng))) * s
+            result.append(int(count_boxes_multi(xy, s, shifts).min()))
+            used += settings.n_offsets
+            continue
+        if tiles is not None:
+            count = lambda dx, dy: [tiles.count(s, dx, dy)]
+        elif settings.cover_mode == COVER_TRAVERSAL:
+            count = lambda dx, dy: [count_boxes_traversal(xy, offsets, s, dx, dy)]
+        else:
+            count = lambda dx, dy: [count_boxes(xy, s, dx, dy)]
+        (best,), n = sample_offsets(count, s, rng, settings)
+        result.append(best)
+        used += n
+    return result, used
+
+
+def estimate_dimension(xy, offsets, seed, settings, extent=None, profile=NO_PROFILE, diagnostics=None):
+    """Minkowski dimension and R² of one feature's coordinate buffer.
+
+    extent is the (width, height, length, vertex count) tuple used to build
+    the scale ladder; it is computed from the coordinates when omitted.
+    When a diagnostics dict is given, the number of grid counts made (one
+    per box size and offset, see min_counts) is stored in it under "offsets".
+    """
+    if xy.shape[0] == 0:
+        return float("nan"), float("nan")
+    if extent is None:
+        with profile.stage("extent"):
+            extent = geometry_extent(xy, offsets)
+    profile.count("vertices scanned", extent[3])
+
+    s_max, s_min = scale_range(*extent, settings.k_scales)
+    sizes = box_sizes(s_max, s_min, settings)
+
+    # Densifying once at the finest scale already gives enough vertices for
+    # every coarser box size. Very large features are counted in strips that
+    # densify their own segments instead.
+    max_length = 0.0
+    if settings.cover_mode == COVER_VERTICES and settings.densify_factor > 0.0:
+        max_length = max(1e-12, s_min * settings.densify_factor)
+    tiles = None
+    if settings.tile_vertices and xy.shape[0] > settings.tile_vertices:
+        with profile.stage("tile"):
+            tiles = TiledCover(xy, offsets, settings.cover_mode, settings.tile_vertices, settings.tile_threads, max_length)
+        profile.count("tiled features", 1)
+        if max_length:
+            profile.count("densified vertices", tiles.n_vertices)
+    elif max_length:
+        with profile.stage("densify"):
+            xy, offsets = densify(xy, offsets, max_length)
+        profile.count("densified vertices", xy.shape[0])
+
+    rng = random.Random(seed)
+    with profile.stage("count"):
+        counts, used = min_counts(xy, offsets, sizes, rng, settings, tiles)
+    profile.count("grid counts", used)
+    if diagnostics is not None:
+        diagnostics["offsets"] = used
+    for i, c in enumerate(counts):
+        profile.count("cells at scale %02d" % (i + 1), c)
+
+    with profile.stage("fit"):
+        return fit_dimension(sizes, counts)
+
+
+def estimate_wkb(wkb, seed=0, settings=Settings()):
+    """Minkowski dimension and R² of a linear or polygon WKB geometry (polygons by their rings); (nan, nan) when it is empty."""
+    xy, offsets = geometry_coordinates(wkb)
+    return estimate_dimension(xy, offsets, seed, settings)
+
+
+class LayerCover(object):
+    """Cell occupancy of many features on one shared set of grids, for a single layer-wide dimension.
+
+    The box sizes come from the layer extent alone (the layer is read once,
+    so no segment-length term) and the grid offsets are drawn once, so every
+    feature is counted on the same grids. Features are added one at a time
+    and their cells merged into one CellSet per (box size, offset); with the
+    dyadic ladder only the finest size is held per offset and the coarser
+    counts are derived at the end. Adaptive offsets need the final counts,
+    so the full number of offsets is always used.
+    """
+
+    def __init__(self, extent, settings, seed=0):
+        xmin, ymin, xmax, ymax = extent
+        s_max, s_min = scale_range(xmax - xmin, ymax - ymin, 0.0, 0, settings.k_scales)
+        self.sizes = box_sizes(s_max, s_min, settings)
+        self.settings = settings
+        self.features = 0
+        self.max_length = 0.0
+        if settings.cover_mode == COVER_VERTICES and settings.densify_factor > 0.0:
+            self.max_length = max(1e-12, self.sizes[-1] * settings.densify_factor)
+
+        rng = random.Random(seed)
+        if settings.scale_ladder == LADDER_DYADIC:
+            grid_sizes = [self.sizes[-1]]
+            span = self.sizes[0]
+        else:
+            grid_sizes = self.sizes
+            span = None
+        # one row of (size, shift_x, shift_y, cells) per box size
+        self.grids = []
+        for s in grid_sizes:
+            shifts = offset_sequence(settings.offset_sampler, settings.n_offsets, rng)
+            self.grids.append([(s, dx * (span or s), dy * (span or s), CellSet()) for dx, dy in shifts])
+
+    def add(self, xy, offsets):
+        """Merge the cells of one feature's coordinate buffer."""
+        if xy.shape[0] == 0:
+            return
+        if self.max_length:
+            xy, offsets = densify(xy, offsets, self.max_length)
+        for row in self.grids:
+            for s, dx, dy, cells in row:
+                if self.settings.cover_mode == COVER_TRAVERSAL:
+                    cells.update(*traversal_cells(xy, offsets, s, dx, dy))
+                else:
+                    cells.update(*cell_indices(xy, s, dx, dy))
+        self.features += 1
+
+    def counts(self):
+        """Minimal cover over the offsets for every box size, coarsest first."""
+        if self.settings.scale_ladder == LADDER_DYADIC:
+            per_offset = [count_boxes_pyramid(*cells.cells(), len(self.sizes))[::-1] for _, _, _, cells in self.grids[0]]
+            return [min(level) for level in zip(*per_offset)]
+        return [min(len(cells) for _, _, _, cells in row) for row in self.grids]
+
+    def estimate(self):
+        """(dimension, r2) of everything added so far; (nan, nan) when nothing was added."""
+        if not self.features:
+            return float("nan"), float("nan")
+        return fit_dimension(self.sizes, self.counts())
+
+
+class CoordinateStore(object):
+    """Coordinates of many features in one flat, memory-mapped float64 file.
+
+    Features are appended once; their vertices go to the file as they come
+    and only the per-feature index (fid, vertex range, part offsets, extent)
+    stays in memory. After finish() the file is mapped read-only, and every
+    feature is handed out as a view into the mapping, so any number of
+    passes over the layer read the coordinates without decoding or copying
+    them again. The file is removed by close().
+    """
+
+    def __init__(self, directory=None):
+        fd, self.path = tempfile.mkstemp(prefix="mink_coords_", suffix=".f8", dir=directory)
+        self._file = os.fdopen(fd, "wb")
+        self._xy = None
+        self.fids = []
+        self.extents = []
+        self._starts = [0]
+        self._parts = []
+
+    def append(self, fid, xy, offsets):
+        """Add one feature's coordinate buffer; xy None (or an empty buffer) is kept as an empty feature."""
+        if xy is None:
+            xy, offsets = np.empty((0, 2)), np.zeros(1, dtype=np.int64)
+        self._file.write(np.ascontiguousarray(xy, dtype="<f8").tobytes())
+        self.fids.append(fid)
+        self.extents.append(geometry_extent(xy, offsets))
+        self._starts.append(self._starts[-1] + xy.shape[0])
+        self._parts.append(np.asarray(offsets, dtype=np.int64))
+
+    def finish(self):
+        """Stop appending and map the file."""
+        self._file.close()
+        self._starts = np.array(self._starts, dtype=np.int64)
+        self._part_starts = np.zeros(len(self._parts) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in self._parts], out=self._part_starts[1:])
+        self._parts = np.concatenate(self._parts) if self._parts else np.zeros(0, dtype=np.int64)
+        n = int(self._starts[-1])
+        self._xy = np.memmap(self.path, dtype="<f8", mode="r", shape=(n, 2)) if n else np.empty((0, 2))
+
+    def __len__(self):
+        return len(self.fids)
+
+    def feature(self, i):
+        """(fid, xy, part offsets, extent) of feature i; xy is a read-only view into the mapping."""
+        start, end = self._starts[i], self._starts[i + 1]
+        offsets = self._parts[self._part_starts[i]:self._part_starts[i + 1]]
+        return self.fids[i], self._xy[start:end], offsets, self.extents[i]
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        self._xy = None
+        with contextlib.suppress(OSError):
+            os.remove(self.path)
+
+
+def sweep(store, configurations, profile=NO_PROFILE):
+    """Yield (configuration index, fid, dimension, r2) for every configuration and feature of a CoordinateStore.
+
+    Configurations are Settings. Each configuration makes one pass over the
+    store; features keep their per-fid seeds, so every row matches a
+    normal run with those settings. Errors give (nan, nan) for that feature.
+    """
+    for c, settings in enumerate(configurations):
+        for i in range(len(store)):
+            fid, xy, offsets, extent = store.feature(i)
+            try:
+                fd, r2 = estimate_dimension(xy, offsets, feature_seed(fid), settings, extent, profile)
+            except Exception:
+                fd, r2 = float("nan"), float("nan")
+            yield c, fid, fd, r2
+
+
+def estimate_batch(batch, settings, instrument=False):
+    """Worker entry point for a batch of (fid, wkb) pairs.
+
+    Returns (results, profile): one (dimension, r2, error, elapsed ms, vertex
+    count, grid counts) tuple per feature, and the batch Profile when instrument is set
+    (None otherwise). Runs without QGIS, so it can be sent to a process pool.
+    Errors are returned per feature instead of raised, so one bad geometry
+    does not lose the rest of the batch.
+    """
+    profile = Profile() if instrument else NO_PROFILE
+    results = []
+    for fid, wkb in batch:
+        if not wkb:
+            results.append((float("nan"), float("nan"), None, 0.0, 0, 0))
+            continue
+        start = time.perf_counter()
+        n_vertices = 0
+        diagnostics = {"offsets": 0}
+        try:
+            with profile.stage("decode"):
+                xy, offsets = geometry_coordinates(wkb)
+            n_vertices = xy.shape[0]
+            fd, r2 = estimate_dimension(xy, offsets, feature_seed(fid), settings, profile=profile, diagnostics=diagnostics)
+            error = None
+        except Exception as e:
+            fd, r2, error = float("nan"), float("nan"), str(e)
+        results.append((fd, r2, error, 1000.0 * (time.perf_counter() - start), n_vertices, diagnostics["offsets"]))
+    profile.count("features", len(batch))
+    return results, (profile if instrument else None)
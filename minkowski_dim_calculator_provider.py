@@ -9,7 +9,7 @@ Eduard Kazakov | ee.kazakov@gmail.com
 
 from qgis.core import QgsProcessingProvider
 from qgis.PyQt.QtGui import QIcon
-from .minkowski_dim_calculator_algorithm import MinkowskiDimCalculatorAlgorithm
+from .minkowski_dim_calculator_algorithm import MinkowskiDimCalculatorAlgorithm, MinkowskiDimUpdateAlgorithm
 import os
 
 class MinkowskiDimCalculatorProvider(QgsProcessingProvider):
@@ -22,6 +22,7 @@ class MinkowskiDimCalculatorProvider(QgsProcessingProvider):
 
     def loadAlgorithms(self):
         self.addAlgorithm(MinkowskiDimCalculatorAlgorithm())
+        self.addAlgorithm(MinkowskiDimUpdateAlgorithm())
 
     def id(self):
         return 'minkowski_dim_calculator_provider'
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Minkowski Dimension Calculator: QGIS Plugin
+
+https://github.com/eduard-kazakov/minkowskiDimCalculator
+
+Eduard Kazakov | ee.kazakov@gmail.com
+
+Fixtures for the tests that run the Processing algorithms. They need the
+QGIS Python bindings (run them with the Python of a QGIS install); without
+them those tests are skipped and the NumPy-only tests still run.
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def qgis_app():
+    """A headless QgsApplication with the plugin's provider registered."""
+    pytest.importorskip("qgis.core")
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from qgis.core import QgsApplication
+
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    # The plugin uses relative imports, so it is imported as a package
+    sys.path.insert(0, os.path.dirname(ROOT))
+    provider_module = importlib.import_module(os.path.basename(ROOT) + ".minkowski_dim_calculator_provider")
+    provider = provider_module.MinkowskiDimCalculatorProvider()
+    QgsApplication.processingRegistry().addProvider(provider)
+    yield app
+    QgsApplication.processingRegistry().removeProvider(provider)
+    app.exitQgis()
+
+
+@pytest.fixture
+def plugin(qgis_app):
+    """The plugin's algorithm module."""
+    return importlib.import_module(os.path.basename(ROOT) + ".minkowski_dim_calculator_algorithm")
+
+
+@pytest.fixture
+def run_algorithm(qgis_app):
+    """run_algorithm(name, parameters[, feedback]) -> (results, context); errors are raised, not logged."""
+    from qgis.core import QgsApplication, QgsProcessingContext, QgsProcessingFeedback, QgsProject
+
+    def run(name, parameters, feedback=None):
+        alg = QgsApplication.processingRegistry().createAlgorithmById("minkowski_dim_calculator_provider:" + name)
+        assert alg is not None, name
+        context = QgsProcessingContext()
+        context.setProject(QgsProject.instance())
+        results, ok = alg.run(parameters, context, feedback or QgsProcessingFeedback(), {}, False)
+        assert ok
+        return results, context
+
+    return run
+
+
+@pytest.fixture
+def output_layer(qgis_app):
+    """output_layer(results, context) -> the layer an algorithm wrote to a temporary output."""
+    from qgis.core import QgsProcessingUtils
+
+    def layer(results, context, key="OUTPUT"):
+        found = QgsProcessingUtils.mapLayerFromString(results[key], context)
+        assert found is not None and found.isValid()
+        return found
+
+    return layer
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Minkowski Dimension Calculator: QGIS Plugin
+
+https://github.com/eduard-kazakov/minkowskiDimCalculator
+
+Eduard Kazakov | ee.kazakov@gmail.com
+
+The Processing algorithms run on small in-memory projects. Needs the QGIS
+Python bindings; skipped without them.
+"""
+
+import threading
+
+import pytest
+
+MODE_RESULTS = 1
+MODE_ZONES = 3
+MODE_SWEEP = 4
+
+
+def memory_layer(definition, name, geometries, attributes=None):
+    from qgis.core import QgsFeature, QgsGeometry, QgsVectorLayer
+
+    layer = QgsVectorLayer(definition, name, "memory")
+    assert layer.isValid()
+    features = []
+    for i, wkt in enumerate(geometries):
+        f = QgsFeature(layer.fields())
+        f.setGeometry(QgsGeometry.fromWkt(wkt))
+        if attributes is not None:
+            f.setAttributes(attributes[i])
+        features.append(f)
+    assert layer.dataProvider().addFeatures(features)[0]
+    layer.updateExtents()
+    return layer
+
+
+def zigzag(x0, x1, y, n=200):
+    step = (x1 - x0) / float(n)
+    return "LineString(%s)" % ", ".join("%r %r" % (x0 + i * step, y + (5.0 if i % 2 else 0.0)) for i in range(n + 1))
+
+
+def box(x0, y0, x1, y1):
+    return "Polygon((%r %r, %r %r, %r %r, %r %r, %r %r))" % (x0, y0, x1, y0, x1, y1, x0, y1, x0, y0)
+
+
+@pytest.mark.parametrize("zones_crs", ["EPSG:3857", "EPSG:4326"])
+def test_zones_clip_lines_to_each_zone(run_algorithm, output_layer, zones_crs):
+    from qgis.core import NULL, QgsCoordinateReferenceSystem, QgsCoordinateTransform, QgsGeometry, QgsProject
+
+    lines = memory_layer("LineString?crs=EPSG:3857", "lines", [
+        zigzag(500.0, 4500.0, 2000.0),    # inside zone 1
+        zigzag(1000.0, 9000.0, 6000.0),   # across zones 1 and 2
+        zigzag(40000.0, 45000.0, 2000.0),  # outside every zone
+    ])
+
+    # Zones are drawn in the CRS of the lines and stored in zones_crs, so
+    # the algorithm has to transform them back before clipping
+    transform = QgsCoordinateTransform(
+        QgsCoordinateReferenceSystem("EPSG:3857"), QgsCoordinateReferenceSystem(zones_crs), QgsProject.instance())
+    shapes = []
+    for rect in ((0.0, 0.0, 5000.0, 10000.0), (5000.0, 0.0, 10000.0, 10000.0), (20000.0, 0.0, 30000.0, 10000.0)):
+        geom = QgsGeometry.fromWkt(box(*rect))
+        geom.transform(transform)
+        shapes.append(geom.asWkt(12))
+    zones = memory_layer("Polygon?crs=%s&field=zone:integer" % zones_crs, "zones", shapes, [[1], [2], [3]])
+
+    results, context = run_algorithm("minkowski_dimension_calculator", {
+        "INPUT": lines,
+        "OUTPUT_MODE": MODE_ZONES,
+        "ZONES": zones,
+        "OUTPUT": "TEMPORARY_OUTPUT",
+    })
+    out = output_layer(results, context)
+    assert out.crs().authid() == zones_crs
+    rows = {f["zone"]: f for f in out.getFeatures()}
+    assert sorted(rows) == [1, 2, 3]
+
+    assert [rows[z]["n_features"] for z in (1, 2, 3)] == [2, 1, 0]
+    for z in (1, 2):
+        assert 0.8 < rows[z]["mink_dim"] < 1.2
+        assert rows[z]["mink_r2"] > 0.9
+    assert rows[3]["mink_dim"] == NULL
+
+
+def tracked_output(run_algorithm, lines, path):
+    from qgis.core import QgsVectorLayer
+
+    run_algorithm("minkowski_dimension_calculator", {"INPUT": lines, "TRACK_CHANGES": True, "OUTPUT": path})
+    layer = QgsVectorLayer(path, "tracked", "ogr")
+    assert layer.isValid()
+    return layer
+
+
+def rows_by_source(layer):
+    return {f["src_fid"]: (f["mink_hash"], f["mink_dim"]) for f in layer.getFeatures()}
+
+
+def test_update_recounts_changed_features_only(run_algorithm, tmp_path):
+    from qgis.core import QgsApplication, QgsFeature, QgsGeometry, QgsProcessingAlgorithm
+
+    lines = memory_layer("LineString?crs=EPSG:3857&field=name:string", "lines", [
+        zigzag(0.0, 1000.0, 0.0), zigzag(0.0, 1000.0, 500.0), zigzag(0.0, 1000.0, 900.0),
+    ], [["a"], ["b"], ["c"]])
+    out = tracked_output(run_algorithm, lines, str(tmp_path / "tracked.gpkg"))
+    before = rows_by_source(out)
+    assert sorted(before) == [1, 2, 3]
+
+    # Edit the input: one geometry changed, one feature deleted, one added
+    provider = lines.dataProvider()
+    assert provider.changeGeometryValues({1: QgsGeometry.fromWkt(zigzag(0.0, 3000.0, 0.0, 50))})
+    assert provider.deleteFeatures([2])
+    added = QgsFeature(lines.fields())
+    added.setGeometry(QgsGeometry.fromWkt(zigzag(0.0, 2000.0, 1500.0)))
+    added.setAttributes(["d"])
+    assert provider.addFeatures([added])[0]
+
+    alg = QgsApplication.processingRegistry().algorithmById("minkowski_dim_calculator_provider:minkowski_dimension_update")
+    assert alg.flags() & QgsProcessingAlgorithm.FlagNoThreading
+
+    run_algorithm("minkowski_dimension_update", {"INPUT": lines, "UPDATE_LAYER": out})
+    assert not out.isEditable()
+    after = rows_by_source(out)
+    assert sorted(after) == [1, 3, 4]
+    assert after[3] == before[3]
+    assert after[1][0] != before[1][0]
+    assert {f["src_fid"]: f["name"] for f in out.getFeatures()} == {1: "a", 3: "c", 4: "d"}
+
+    # The refreshed layer matches a full run on the edited input
+    fresh = rows_by_source(tracked_output(run_algorithm, lines, str(tmp_path / "fresh.gpkg")))
+    assert after == fresh
+
+
+def test_update_leaves_the_key_column_to_the_provider(run_algorithm, tmp_path):
+    from qgis.core import NULL, QgsFeature, QgsGeometry, QgsVectorLayer
+
+    # A GeoPackage input has a fid column, and so has the output written from it
+    path = str(tmp_path / "lines.gpkg")
+    run_algorithm("minkowski_dimension_calculator", {
+        "INPUT": memory_layer("LineString?crs=EPSG:3857&field=name:string", "lines", [
+            zigzag(0.0, 1000.0, 0.0), zigzag(0.0, 1000.0, 500.0),
+        ], [["a"], ["b"]]),
+        "OUTPUT": path,
+    })
+    lines = QgsVectorLayer(path, "lines", "ogr")
+    assert lines.isValid()
+    out = tracked_output(run_algorithm, lines, str(tmp_path / "tracked.gpkg"))
+
+    # An untracked row takes the output fid the next input feature will get
+    row = QgsFeature(out.fields())
+    row.setGeometry(QgsGeometry.fromWkt(zigzag(0.0, 1000.0, 2000.0)))
+    assert out.dataProvider().addFeatures([row])[0]
+    added = QgsFeature(lines.fields())
+    added.setGeometry(QgsGeometry.fromWkt(zigzag(0.0, 2000.0, 1500.0)))
+    added.setAttribute("name", "c")
+    assert lines.dataProvider().addFeatures([added])[0]
+
+    run_algorithm("minkowski_dimension_update", {"INPUT": lines, "UPDATE_LAYER": out})
+    rows = {f["src_fid"]: f for f in out.getFeatures() if f["src_fid"] != NULL}
+    assert sorted(rows) == [1, 2, 3]
+    assert rows[3]["name"] == "c" and rows[3].id() not in (1, 2, 3)
+    assert out.featureCount() == 4
+
+
+def test_update_refuses_a_layer_in_edit_mode(run_algorithm, tmp_path):
+    from qgis.core import QgsProcessingException
+
+    lines = memory_layer("LineString?crs=EPSG:3857", "lines", [zigzag(0.0, 1000.0, 0.0)])
+    out = tracked_output(run_algorithm, lines, str(tmp_path / "tracked.gpkg"))
+    assert out.startEditing()
+    try:
+        with pytest.raises(QgsProcessingException):
+            run_algorithm("minkowski_dimension_update", {"INPUT": lines, "UPDATE_LAYER": out})
+        assert out.isEditable()
+    finally:
+        out.rollBack()
+
+
+def test_prefetcher_opens_and_reads_on_its_own_thread(plugin):
+    threads = []
+
+    def open_features():
+        threads.append(threading.get_ident())
+        for i in range(300):
+            threads.append(threading.get_ident())
+            yield i
+
+    assert list(plugin.FeaturePrefetcher(open_features, 64, 2)) == list(range(300))
+    assert len(set(threads)) == 1 and threads[0] != threading.get_ident()
+
+    del threads[:]
+    assert list(plugin.FeaturePrefetcher(open_features, 64, 0)) == list(range(300))
+    assert set(threads) == {threading.get_ident()}
+
+
+def test_prefetcher_raises_read_errors_in_the_caller(plugin):
+    def open_features():
+        yield 1
+        raise ValueError("broken provider")
+
+    with pytest.raises(ValueError):
+        list(plugin.FeaturePrefetcher(open_features, 64, 2))
+
+
+def multipart_lines():
+    parts = [
+        "MultiLineString(%s)" % ", ".join(zigzag(i * 100.0, i * 100.0 + 80.0, p * 30.0, 20)[len("LineString"):] for p in range(1 + i % 3))
+        for i in range(150)
+    ]
+    return memory_layer("MultiLineString?crs=EPSG:3857&field=n:integer", "multi", parts, [[i] for i in range(150)])
+
+
+@pytest.mark.parametrize("per_part", [False, True])
+@pytest.mark.parametrize("storage", ["memory", "gpkg"])
+def test_read_ahead_matches_reading_in_turn(run_algorithm, output_layer, tmp_path, storage, per_part):
+    from qgis.core import QgsVectorLayer
+
+    lines = multipart_lines()
+    if storage == "gpkg":
+        path = str(tmp_path / "lines.gpkg")
+        run_algorithm("minkowski_dimension_calculator", {"INPUT": lines, "OUTPUT": path})
+        lines = QgsVectorLayer(path, "lines", "ogr")
+        assert lines.isValid() and lines.featureCount() == 150
+
+    rows = []
+    for read_ahead in (0, 4):
+        results, context = run_algorithm("minkowski_dimension_calculator", {
+            "INPUT": lines,
+            "OUTPUT_MODE": MODE_RESULTS,
+            "PER_PART": per_part,
+            "READ_AHEAD": read_ahead,
+            "OUTPUT": "TEMPORARY_OUTPUT",
+        })
+        rows.append([f.attributes() for f in output_layer(results, context).getFeatures()])
+    assert rows[0] == rows[1]
+    assert len(rows[0]) == (300 if per_part else 150)
+
+
+def test_per_part_progress_stays_within_bounds(run_algorithm):
+    from qgis.core import QgsProcessingFeedback
+
+    feedback = QgsProcessingFeedback()
+    progress = []
+    feedback.progressChanged.connect(progress.append)
+    run_algorithm("minkowski_dimension_calculator", {
+        "INPUT": multipart_lines(), "PER_PART": True, "OUTPUT": "TEMPORARY_OUTPUT",
+    }, feedback)
+    assert progress and max(progress) <= 100.0
+
+
+def test_per_part_rejects_change_tracking(run_algorithm, tmp_path):
+    from qgis.core import QgsField, QgsProcessingException, QgsVectorLayer
+    from qgis.PyQt.QtCore import QMetaType
+
+    with pytest.raises(QgsProcessingException):
+        run_algorithm("minkowski_dimension_calculator", {
+            "INPUT": multipart_lines(), "PER_PART": True, "TRACK_CHANGES": True, "OUTPUT": "TEMPORARY_OUTPUT",
+        })
+
+    # A per-part layer that carries tracking fields anyway is not updated
+    path = str(tmp_path / "parts.gpkg")
+    lines = multipart_lines()
+    run_algorithm("minkowski_dimension_calculator", {"INPUT": lines, "PER_PART": True, "OUTPUT": path})
+    parts = QgsVectorLayer(path, "parts", "ogr")
+    assert parts.dataProvider().addAttributes([QgsField("src_fid", QMetaType.Type.LongLong), QgsField("mink_hash", QMetaType.Type.QString)])
+    parts.updateFields()
+    with pytest.raises(QgsProcessingException):
+        run_algorithm("minkowski_dimension_update", {"INPUT": lines, "UPDATE_LAYER": parts})
+
+
+def test_densify_factor_zero_matches_the_sweep(run_algorithm, output_layer):
+    lines = multipart_lines()
+    results, context = run_algorithm("minkowski_dimension_calculator", {
+        "INPUT": lines, "OUTPUT_MODE": MODE_RESULTS, "DENSIFY_FACTOR": 0.0, "OUTPUT": "TEMPORARY_OUTPUT",
+    })
+    normal = {f["src_fid"]: f["mink_dim"] for f in output_layer(results, context).getFeatures()}
+    results, context = run_algorithm("minkowski_dimension_calculator", {
+        "INPUT": lines, "OUTPUT_MODE": MODE_SWEEP, "SWEEP_DENSIFY": "0, 0.5", "OUTPUT": "TEMPORARY_OUTPUT",
+    })
+    swept = {}
+    for f in output_layer(results, context).getFeatures():
+        swept.setdefault(f["densify"], {})[f["src_fid"]] = f["mink_dim"]
+    assert swept[0.0] == normal
+    assert swept[0.5] != normal
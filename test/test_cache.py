@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Minkowski Dimension Calculator: QGIS Plugin
+
+https://github.com/eduard-kazakov/minkowskiDimCalculator
+
+Eduard Kazakov | ee.kazakov@gmail.com
+
+Result cache keys and size bound. Needs pytest, not QGIS.
+"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import minkowski_dim_calculator_core as core  # noqa: E402
+from minkowski_dim_calculator_cache import ResultCache  # noqa: E402
+
+
+def key(settings):
+    return ResultCache.key(b"wkb", 1, *core.result_params(settings))
+
+
+def test_key_ignores_settings_that_do_not_change_the_result():
+    base = core.Settings()
+    assert key(base) == key(base._replace(tile_vertices=100000, tile_threads=8))
+    assert key(base) == key(base._replace(offset_patience=5, offset_tolerance=0.2))
+    traversal = base._replace(cover_mode=core.COVER_TRAVERSAL)
+    assert key(traversal) == key(traversal._replace(densify_factor=1.0))
+
+
+def test_key_follows_settings_that_change_the_result():
+    base = core.Settings()
+    adaptive = base._replace(adaptive_offsets=True)
+    assert key(base) != key(base._replace(k_scales=10))
+    assert key(base) != key(base._replace(densify_factor=1.0))
+    assert key(base) != key(adaptive)
+    assert key(adaptive) != key(adaptive._replace(offset_patience=5))
+
+
+def test_size_bound_holds_during_a_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(ResultCache, "COMMIT_EVERY", 10)
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(path, max_entries=25)
+    for i in range(200):
+        cache.put(ResultCache.key(b"%d" % i, 0), 1.0, 1.0)
+        (count,) = sqlite3.connect(path).execute("SELECT COUNT(*) FROM results").fetchone()
+        assert count <= 25 + ResultCache.COMMIT_EVERY
+    cache.close()
+    assert cache.entries == 25
+    assert cache.evicted == 175
+    # the most recent entries are kept
+    cache = ResultCache(path, max_entries=25)
+    assert cache.get(ResultCache.key(b"199", 0)) == (1.0, 1.0)
+    assert cache.get(ResultCache.key(b"0", 0)) is None
+    cache.close()
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Minkowski Dimension Calculator: QGIS Plugin
+
+https://github.com/eduard-kazakov/minkowskiDimCalculator
+
+Eduard Kazakov | ee.kazakov@gmail.com
+
+Box counts of the vectorized engine against plain per-vertex Python loops,
+on seeded random multipart coordinates. Needs NumPy and pytest, not QGIS:
+
+    python -m pytest test
+"""
+
+import math
+import random
+import struct
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import minkowski_dim_calculator_core as core  # noqa: E402
+
+CASES = range(50)
+
+
+def random_parts(seed, max_parts=4, max_vertices=300):
+    """(xy, offsets) of a random walk split into parts, single-vertex parts included."""
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(1, max_vertices, rng.integers(1, max_parts + 1))
+    xy = np.cumsum(rng.normal(scale=rng.uniform(0.1, 5.0), size=(int(sizes.sum()), 2)), axis=0)
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    return xy, offsets
+
+
+def random_grid(seed, xy):
+    """A box size between 1/200 and 1/2 of the extent and a random grid origin."""
+    rng = np.random.default_rng(seed + 1000)
+    span = max(float(np.ptp(xy, axis=0).max()), 1e-9)
+    s = span * math.exp(rng.uniform(math.log(1 / 200.0), math.log(0.5)))
+    return s, rng.uniform(0, s), rng.uniform(0, s)
+
+
+def vertex_cells(xy, s, shift_x, shift_y):
+    """The original engine: a set of (floor, floor) tuples, one vertex at a time."""
+    return {(math.floor((x - shift_x) / s), math.floor((y - shift_y) / s)) for x, y in xy.tolist()}
+
+
+def crossed_cells(xy, offsets, s, shift_x, shift_y):
+    """Cells passed through by the segments: cut each segment at every grid line and take the cell of each piece."""
+    cells = vertex_cells(xy, s, shift_x, shift_y)
+    g = (xy - (shift_x, shift_y)) / s
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        for (x0, y0), (x1, y1) in zip(g[start:end - 1].tolist(), g[start + 1:end].tolist()):
+            ts = {0.0, 1.0}
+            for a0, a1 in ((x0, x1), (y0, y1)):
+                if a1 != a0:
+                    lo, hi = sorted((a0, a1))
+                    ts.update((k - a0) / (a1 - a0) for k in range(math.ceil(lo), math.floor(hi) + 1))
+            ts = sorted(t for t in ts if 0.0 <= t <= 1.0)
+            for t0, t1 in zip(ts[:-1], ts[1:]):
+                t = 0.5 * (t0 + t1)
+                cells.add((math.floor(x0 + t * (x1 - x0)), math.floor(y0 + t * (y1 - y0))))
+    return cells
+
+
+@pytest.mark.parametrize("seed", CASES)
+def test_count_boxes_matches_vertex_loop(seed):
+    xy, _ = random_parts(seed)
+    s, dx, dy = random_grid(seed, xy)
+    assert core.count_boxes(xy, s, dx, dy) == len(vertex_cells(xy, s, dx, dy))
+
+
+@pytest.mark.parametrize("seed", CASES)
+def test_count_boxes_multi_matches_vertex_loop(seed):
+    xy, _ = random_parts(seed)
+    s, _, _ = random_grid(seed, xy)
+    shifts = np.random.default_rng(seed).uniform(0, s, (5, 2))
+    expected = [len(vertex_cells(xy, s, dx, dy)) for dx, dy in shifts]
+    assert list(core.count_boxes_multi(xy, s, shifts)) == expected
+
+
+@pytest.mark.parametrize("seed", CASES)
+def test_count_boxes_traversal_matches_segment_cuts(seed):
+    xy, offsets = random_parts(seed)
+    s, dx, dy = random_grid(seed, xy)
+    assert core.count_boxes_traversal(xy, offsets, s, dx, dy) == len(crossed_cells(xy, offsets, s, dx, dy))
+
+
+def test_empty_coordinates():
+    empty = np.empty((0, 2))
+    assert core.count_boxes(empty, 1.0, 0.0, 0.0) == 0
+    assert core.count_boxes_traversal(empty, np.zeros(1, dtype=np.int64), 1.0, 0.0, 0.0) == 0
+
+
+def test_densify_splits_like_qgis():
+    # densifyByDistance adds floor(L / d) vertices to a segment of length L,
+    # so 10 / 2 gives 6 pieces and 3 / 2 gives 2
+    xy = np.array([[0.0, 0.0], [10.0, 0.0], [10.0, 3.0]])
+    out, offsets = core.densify(xy, np.array([0, 3]), 2.0)
+    assert offsets.tolist() == [0, 9]
+    assert np.allclose(out[:7, 0], np.linspace(0.0, 10.0, 7))
+    assert np.allclose(out[6:, 1], [0.0, 1.5, 3.0])
+
+
+@pytest.mark.parametrize("sampler", [core.SAMPLER_UNIFORM, core.SAMPLER_HALTON, core.SAMPLER_SOBOL, core.SAMPLER_GOLDEN])
+def test_offset_sequence_is_open_ended(sampler):
+    # adaptive stopping takes a prefix of the sequence, so the first points
+    # must not depend on how many were asked for
+    short = list(core.offset_sequence(sampler, 5, np.random.default_rng(3)))
+    long = list(core.offset_sequence(sampler, 50, np.random.default_rng(3)))
+    assert short == long[:5]
+    assert all(0.0 <= u < 1.0 and 0.0 <= v < 1.0 for u, v in long)
+    assert len(set(long)) == len(long)
+
+
+TILED = [
+    (core.COVER_VERTICES, 0.0),
+    (core.COVER_VERTICES, 0.5),
+    (core.COVER_TRAVERSAL, 0.0),
+]
+
+
+def monolithic_cells(xy, offsets, cover_mode, max_length, s, dx, dy):
+    if cover_mode == core.COVER_TRAVERSAL:
+        return core.traversal_cells(xy, offsets, s, dx, dy)
+    if max_length > 0.0:
+        xy, offsets = core.densify(xy, offsets, max_length)
+    return core.cell_indices(xy, s, dx, dy)
+
+
+@pytest.mark.parametrize("cover_mode, factor", TILED)
+@pytest.mark.parametrize("seed", range(20))
+def test_tiled_cover_matches_monolithic(seed, cover_mode, factor):
+    # budgets far below the feature size force many strips and chunks per strip
+    xy, offsets = random_parts(seed)
+    s, dx, dy = random_grid(seed, xy)
+    max_length = s * factor
+    for budget, threads in ((25, 1), (100, 2)):
+        tiles = core.TiledCover(xy, offsets, cover_mode, budget, threads, max_length)
+        ix, iy = monolithic_cells(xy, offsets, cover_mode, max_length, s, dx, dy)
+        assert tiles.count(s, dx, dy) == core.count_cells(ix, iy)
+        assert tiles.count_pyramid(s, dx, dy, 4) == core.count_boxes_pyramid(ix, iy, 4)
+
+
+@pytest.mark.parametrize("ladder", [core.LADDER_GEOMETRIC, core.LADDER_DYADIC])
+@pytest.mark.parametrize("cover_mode, factor", TILED)
+def test_tiled_estimate_matches_monolithic(cover_mode, factor, ladder):
+    xy, offsets = random_parts(7, max_parts=3, max_vertices=3000)
+    settings = core.Settings(cover_mode=cover_mode, densify_factor=factor, scale_ladder=ladder)
+    tiled = settings._replace(tile_vertices=200, tile_threads=2)
+    assert core.estimate_dimension(xy, offsets, 5, tiled) == core.estimate_dimension(xy, offsets, 5, settings)
+
+
+def scripted(values):
+    """count(dx, dy) returning the next of values, whatever the offset."""
+    values = iter(values)
+    return lambda dx, dy: [next(values)]
+
+
+def test_sample_offsets_uses_every_offset_without_adaptive_stopping():
+    settings = core.Settings(n_offsets=5)
+    assert core.sample_offsets(scripted([7, 7, 7, 5, 6]), 1.0, random.Random(1), settings) == ([5], 5)
+
+
+def test_sample_offsets_stops_after_patience_draws_without_improvement():
+    settings = core.Settings(n_offsets=10, adaptive_offsets=True, offset_patience=2, offset_tolerance=0.0)
+    # 9 improves on 10, then two draws in a row do not
+    assert core.sample_offsets(scripted([10, 9, 9, 12, 1]), 1.0, random.Random(1), settings) == ([9], 4)
+
+
+def test_sample_offsets_stops_once_counts_agree_within_tolerance():
+    settings = core.Settings(n_offsets=10, adaptive_offsets=True, offset_patience=10, offset_tolerance=0.05)
+    assert core.sample_offsets(scripted([100, 98, 1]), 1.0, random.Random(1), settings) == ([98], 2)
+
+
+def test_sample_offsets_never_exceeds_the_hard_cap():
+    settings = core.Settings(n_offsets=4, adaptive_offsets=True, offset_patience=2, offset_tolerance=0.0)
+    assert core.sample_offsets(scripted([10, 9, 8, 7, 6, 5]), 1.0, random.Random(1), settings) == ([7], 4)
+
+
+@pytest.mark.parametrize("cover_mode", [core.COVER_VERTICES, core.COVER_TRAVERSAL])
+def test_grid_counts_mean_the_same_on_both_ladders(cover_mode):
+    # one grid count per box size and offset, whichever ladder
+    xy, offsets = random_parts(3, max_vertices=2000)
+    for ladder in (core.LADDER_GEOMETRIC, core.LADDER_DYADIC):
+        settings = core.Settings(n_offsets=3, cover_mode=cover_mode, scale_ladder=ladder)
+        s_max, s_min = core.scale_range(*core.geometry_extent(xy, offsets), settings.k_scales)
+        diagnostics = {}
+        core.estimate_dimension(xy, offsets, 1, settings, diagnostics=diagnostics)
+        assert diagnostics["offsets"] == 3 * len(core.box_sizes(s_max, s_min, settings))
+
+
+def cell_set_contents(cells):
+    ix, iy = cells.cells()
+    pairs = list(zip(ix.tolist(), iy.tolist()))
+    assert len(pairs) == len(set(pairs)) == len(cells)
+    return set(pairs)
+
+
+def fill(cells, points):
+    """Add points one at a time, as the reference engine does, and return them as a set."""
+    for ix, iy in points:
+        cells.add(ix, iy)
+    return set(points)
+
+
+def random_cells(seed, n, lo, hi):
+    rng = np.random.default_rng(seed)
+    return [tuple(p) for p in rng.integers(lo, hi, size=(n, 2)).tolist()]
+
+
+@pytest.fixture
+def small_buffer(monkeypatch):
+    # flush every few cells so that many runs are created and merged
+    monkeypatch.setattr(core.CellSet, "BUFFER", 7)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_cell_set_bitmap(small_buffer, seed):
+    cells = core.CellSet((-20, 30), (5, 40))
+    expected = fill(cells, random_cells(seed, 500, (-20, 5), (31, 41)))
+    assert cell_set_contents(cells) == expected
+    assert cells._bitmap is not None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_cell_set_morton_runs(small_buffer, seed):
+    cells = core.CellSet()
+    expected = fill(cells, random_cells(seed, 2000, -300, 300))
+    rng = np.random.default_rng(seed)
+    ix, iy = rng.integers(-1000, 1000, size=(2, 300))
+    cells.update(ix, iy)
+    expected |= set(zip(ix.tolist(), iy.tolist()))
+    assert cell_set_contents(cells) == expected
+    assert cells._bitmap is None and cells._pairs is None
+
+
+def test_cell_set_leaves_the_bitmap_for_a_cell_outside_the_ranges(small_buffer):
+    cells = core.CellSet((0, 9), (0, 9))
+    expected = fill(cells, random_cells(1, 50, 0, 10))
+    expected |= fill(cells, [(10, 3), (-5, -5)])
+    expected |= fill(cells, random_cells(2, 50, -50, 50))
+    assert cell_set_contents(cells) == expected
+    assert cells._bitmap is None and cells._pairs is None
+
+
+def test_cell_set_keeps_pairs_beyond_the_morton_range(small_buffer):
+    far = 1 << 40
+    cells = core.CellSet()
+    expected = fill(cells, random_cells(3, 100, -100, 100))
+    expected |= fill(cells, [(far, 0), (0, -far), (far, far)])
+    expected |= fill(cells, random_cells(4, 100, -100, 100))
+    assert cell_set_contents(cells) == expected
+    assert cells._pairs is not None
+
+
+def test_cell_set_goes_from_the_bitmap_to_pairs(small_buffer):
+    cells = core.CellSet((0, 9), (0, 9))
+    expected = fill(cells, random_cells(5, 50, 0, 10))
+    expected |= fill(cells, [(-(1 << 35), 4)])
+    assert cell_set_contents(cells) == expected
+    assert cells._bitmap is None and cells._pairs is not None
+
+
+@pytest.mark.parametrize("ladder", [core.LADDER_GEOMETRIC, core.LADDER_DYADIC])
+@pytest.mark.parametrize("cover_mode, factor", TILED)
+@pytest.mark.parametrize("seed", range(3))
+def test_layer_cover_of_split_curve_matches_whole_curve(seed, cover_mode, factor, ladder):
+    # consecutive pieces share their end vertex, so together they have the curve's segments
+    rng = np.random.default_rng(seed)
+    xy = np.cumsum(rng.normal(size=(1500, 2)), axis=0)
+    cuts = np.sort(rng.choice(np.arange(1, 1499), 4, replace=False))
+    bounds = (0, *cuts.tolist(), 1499)
+    settings = core.Settings(cover_mode=cover_mode, densify_factor=factor, scale_ladder=ladder)
+    extent = (*xy.min(axis=0), *xy.max(axis=0))
+
+    whole = core.LayerCover(extent, settings, seed)
+    whole.add(xy, np.array([0, xy.shape[0]]))
+    split = core.LayerCover(extent, settings, seed)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        piece = xy[start:end + 1]
+        split.add(piece, np.array([0, piece.shape[0]]))
+
+    assert split.features == 5
+    assert split.counts() == whole.counts()
+    assert split.estimate() == whole.estimate()
+
+
+def multilinestring_wkb(xy, offsets):
+    """Little-endian WKB MultiLineString with one linestring per part."""
+    parts = [xy[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+    out = [struct.pack("<BII", 1, 5, len(parts))]
+    for part in parts:
+        out.append(struct.pack("<BII", 1, 2, part.shape[0]))
+        out.append(np.ascontiguousarray(part, dtype="<f8").tobytes())
+    return b"".join(out)
+
+
+def same(a, b):
+    return a == b or (math.isnan(a) and math.isnan(b))
+
+
+def test_sweep_rows_match_single_estimates(tmp_path):
+    features = {fid: random_parts(fid, max_vertices=200) for fid in (3, 8, 21, 40)}
+    configurations = [
+        core.Settings(),
+        core.Settings(k_scales=6, n_offsets=2, densify_factor=0.0),
+        core.Settings(scale_ladder=core.LADDER_DYADIC, cover_mode=core.COVER_TRAVERSAL, offset_sampler=core.SAMPLER_SOBOL),
+    ]
+
+    store = core.CoordinateStore(str(tmp_path))
+    assert os.path.dirname(store.path) == str(tmp_path)
+    for fid, (xy, offsets) in features.items():
+        store.append(fid, xy, offsets)
+    store.append(50, None, None)
+    store.append(51, np.empty((0, 2)), np.zeros(1, dtype=np.int64))
+    store.finish()
+    assert len(store) == 6
+
+    rows = list(core.sweep(store, configurations))
+    assert [(c, fid) for c, fid, _, _ in rows] == [(c, fid) for c in range(3) for fid in (3, 8, 21, 40, 50, 51)]
+    for c, fid, fd, r2 in rows:
+        if fid in features:
+            expected = core.estimate_wkb(multilinestring_wkb(*features[fid]), core.feature_seed(fid), configurations[c])
+        else:
+            expected = (float("nan"), float("nan"))
+        assert same(fd, expected[0]) and same(r2, expected[1])
+
+    store.close()
+    assert not os.path.exists(store.path)
+
+
+def test_coordinate_store_close_before_finish_removes_the_file(tmp_path):
+    store = core.CoordinateStore(str(tmp_path))
+    store.append(1, *random_parts(1))
+    assert os.path.exists(store.path)
+    store.close()
+    assert os.listdir(str(tmp_path)) == []